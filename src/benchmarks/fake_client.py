@@ -0,0 +1,71 @@
+import hashlib
+import time
+from types import SimpleNamespace
+from typing import List
+import numpy as np
+
+
+class FakeEmbeddingsAPI:
+    """Substitui ``client.embeddings``: vetores determinísticos derivados do texto."""
+
+    def __init__(self, dimension: int, latency_seconds: float):
+        self.dimension = dimension
+        self.latency_seconds = latency_seconds
+        self.requests = 0
+
+    def embed_text(self, text: str) -> List[float]:
+        seed = int.from_bytes(
+            hashlib.sha256(text.encode("utf-8")).digest()[:8], "little"
+        )
+        vector = np.random.default_rng(seed).standard_normal(self.dimension)
+        return (vector / np.linalg.norm(vector)).astype(np.float32).tolist()
+
+    def create(
+        self, input: List[str], model: str, **kwargs
+    ):  # pylint: disable=redefined-builtin,unused-argument
+        self.requests += 1
+        if self.latency_seconds > 0:
+            time.sleep(self.latency_seconds)
+        return SimpleNamespace(
+            data=[
+                SimpleNamespace(index=position, embedding=self.embed_text(text))
+                for position, text in enumerate(input)
+            ]
+        )
+
+
+class FakeChatCompletionsAPI:
+    """Substitui ``client.chat.completions`` com uma resposta fixa no formato esperado."""
+
+    ANSWER = '```python\n"""\nDocstring gerada para o benchmark.\n"""\n```'
+
+    def __init__(self, latency_seconds: float):
+        self.latency_seconds = latency_seconds
+        self.requests = 0
+
+    def create(self, model: str, messages, **kwargs):  # pylint: disable=unused-argument
+        self.requests += 1
+        if self.latency_seconds > 0:
+            time.sleep(self.latency_seconds)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=self.ANSWER))]
+        )
+
+
+class FakeOpenAIClient:
+    """Cliente com a mesma interface usada do cliente da OpenAI, sem acesso à rede.
+
+    As latências simuladas permitem medir o custo do próprio pipeline
+    (``0``) ou aproximar o comportamento com a API real.
+    """
+
+    def __init__(
+        self,
+        dimension: int = 1536,
+        embedding_latency_seconds: float = 0.0,
+        completion_latency_seconds: float = 0.0,
+    ):
+        self.embeddings = FakeEmbeddingsAPI(dimension, embedding_latency_seconds)
+        self.chat = SimpleNamespace(
+            completions=FakeChatCompletionsAPI(completion_latency_seconds)
+        )
@@ -0,0 +1,262 @@
+"""
+Benchmark das etapas de ingestão e consulta do pipeline de RAG
+
+Gera um repositório Python e um PDF sintéticos, mede cada etapa separadamente
+com um cliente falso e determinístico (sem rede) e grava um relatório JSON com
+vazão e percentis de latência, para comparação entre commits.
+
+Uso (a partir da pasta src):
+    python -m benchmarks.run_benchmarks --arquivos 200 --saida resultado.json
+    python -m benchmarks.run_benchmarks --comparar base.json --saida atual.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import List
+import numpy as np
+from benchmarks.fake_client import FakeOpenAIClient
+from benchmarks.synthetic_data import generate_pdf, generate_python_repository
+from utils.chunk_processing import iter_page_chunks, split_code_into_chunks
+from utils.completion_cache import CompletionCache
+from utils.concrete_syntax_tree_parsing import extract_file_record
+from utils.embedders import HashingEmbedder
+from utils.embedding_cache import QueryEmbeddingCache
+from utils.embeddings_processing import OpenAIEmbedder, create_embeddings
+from utils.indexing import create_faiss_index, search_index
+from utils.pdf_processing import iter_pdf_pages
+from utils.query_processing import answer_query
+from utils.repository_processing import get_all_python_files_from_repository
+
+# O log das funções medidas não deve pesar nas medições
+logger = logging.getLogger("benchmarks")
+logger.setLevel(logging.WARNING)
+logger.propagate = False
+logger.addHandler(logging.NullHandler())
+
+
+class StageTimer:
+    """Acumula as latências de cada execução de uma etapa e os itens processados."""
+
+    def __init__(self):
+        self.latencies: dict[str, List[float]] = {}
+        self.items: dict[str, int] = {}
+
+    @contextmanager
+    def measure(self, stage: str, items: int = 1):
+        start = time.perf_counter()
+        yield
+        elapsed = time.perf_counter() - start
+        self.latencies.setdefault(stage, []).append(elapsed)
+        self.items[stage] = self.items.get(stage, 0) + items
+
+    def summary(self) -> dict:
+        report = {}
+        for stage, latencies in self.latencies.items():
+            latencies_ms = np.array(latencies) * 1000
+            total_seconds = float(np.sum(latencies))
+            report[stage] = {
+                "execucoes": len(latencies),
+                "itens": self.items[stage],
+                "tempo_total_s": round(total_seconds, 6),
+                "vazao_itens_por_s": (
+                    round(self.items[stage] / total_seconds, 3)
+                    if total_seconds > 0
+                    else None
+                ),
+                "latencia_ms": {
+                    "p50": round(float(np.percentile(latencies_ms, 50)), 4),
+                    "p90": round(float(np.percentile(latencies_ms, 90)), 4),
+                    "p99": round(float(np.percentile(latencies_ms, 99)), 4),
+                    "max": round(float(np.max(latencies_ms)), 4),
+                },
+            }
+        return report
+
+
+def get_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(args: argparse.Namespace, work_dir: str) -> dict:
+    timer = StageTimer()
+    rng = random.Random(args.semente)
+
+    repo_path = os.path.join(work_dir, "repositorio")
+    pdf_path = os.path.join(work_dir, "documento.pdf")
+    generate_python_repository(
+        repo_path,
+        files=args.arquivos,
+        functions_per_file=args.funcoes,
+        seed=args.semente,
+    )
+    generate_pdf(pdf_path, pages=args.paginas, seed=args.semente)
+
+    client = FakeOpenAIClient(
+        dimension=args.dimensao,
+        embedding_latency_seconds=args.latencia_embeddings,
+        completion_latency_seconds=args.latencia_llm,
+    )
+    if args.backend == "local":
+        embedder = HashingEmbedder(dimension=args.dimensao)
+    else:
+        embedder = OpenAIEmbedder(client)
+
+    for _ in range(args.repeticoes):
+        with timer.measure("get_all_python_files_from_repository", args.arquivos):
+            file_names = get_all_python_files_from_repository(logger, repo_path)
+
+    chunks: List[str] = []
+    for file_name in file_names:
+        with open(file_name, mode="r", encoding="utf-8") as code_file:
+            file_content = code_file.read()
+        # Análise sintática e divisão em chunks são medidas separadamente
+        with timer.measure("extract_file_record"):
+            record = extract_file_record(logger, file_content, file_name)
+        with timer.measure("split_code_into_chunks"):
+            file_chunks = split_code_into_chunks(
+                logger,
+                file_content,
+                os.path.relpath(file_name, repo_path),
+                record=record,
+            )
+        chunks.extend(file_chunks)
+
+    for _ in range(args.repeticoes):
+        with timer.measure("iter_pdf_pages", args.paginas):
+            pages = list(iter_pdf_pages(logger, pdf_path))
+        with timer.measure("iter_page_chunks", args.paginas):
+            pdf_chunks = list(iter_page_chunks(logger, pages))
+
+    embeddings: List[List[float]] = []
+    for start in range(0, len(chunks), args.lote_embeddings):
+        batch = chunks[start : start + args.lote_embeddings]
+        with timer.measure("create_embeddings", len(batch)):
+            embeddings.extend(
+                create_embeddings(logger, batch, client, embedder=embedder)
+            )
+
+    for _ in range(args.repeticoes):
+        with timer.measure("create_faiss_index", len(embeddings)):
+            index = create_faiss_index(logger, embeddings)
+
+    # As consultas reutilizam chunks indexados: os vizinhos mais próximos existem
+    query_positions = [rng.randrange(len(chunks)) for _ in range(args.consultas)]
+    for position in query_positions:
+        with timer.measure("search_index"):
+            search_index(logger, index, embeddings[position], args.k)
+
+    completion_cache = CompletionCache(
+        logger, cache_file=os.path.join(work_dir, "completions_cache.sqlite")
+    )
+    for position in query_positions:
+        with timer.measure("answer_query"):
+            answer_query(
+                logger,
+                f"Gere a docstring para essa função: \n {chunks[position]}",
+                index,
+                chunks,
+                "Você é um assistente de geração de documentação de códigos em Python.",
+                client,
+                k=args.k,
+                query_cache=QueryEmbeddingCache(),
+                completion_cache=completion_cache,
+                bypass_completion_cache=True,
+            )
+    completion_cache.close()
+
+    return {
+        "commit": get_commit(),
+        "data": datetime.now(timezone.utc).isoformat(),
+        "parametros": vars(args),
+        "ambiente": {
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "dados": {
+            "arquivos": len(file_names),
+            "chunks_de_codigo": len(chunks),
+            "paginas_pdf": args.paginas,
+            "chunks_do_pdf": len(pdf_chunks),
+            "requisicoes_de_embeddings": client.embeddings.requests,
+        },
+        "etapas": timer.summary(),
+    }
+
+
+def compare_results(baseline: dict, current: dict):
+    print(f"Comparação com o commit {baseline.get('commit')}:")
+    print(f"{'etapa':40} {'p50 base':>10} {'p50 atual':>10} {'variação':>9}")
+    for stage, result in current["etapas"].items():
+        if stage not in baseline["etapas"]:
+            continue
+        before = baseline["etapas"][stage]["latencia_ms"]["p50"]
+        after = result["latencia_ms"]["p50"]
+        change = f"{100 * (after - before) / before:+.1f}%" if before > 0 else "-"
+        print(f"{stage:40} {before:10.3f} {after:10.3f} {change:>9}")
+
+
+def parse_arguments(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--arquivos", type=int, default=200)
+    parser.add_argument("--funcoes", type=int, default=10, help="funções por arquivo")
+    parser.add_argument("--paginas", type=int, default=50, help="páginas do PDF")
+    parser.add_argument("--consultas", type=int, default=100)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--dimensao", type=int, default=1536)
+    parser.add_argument("--lote-embeddings", type=int, default=256)
+    parser.add_argument("--backend", choices=["openai", "local"], default="openai")
+    parser.add_argument("--latencia-embeddings", type=float, default=0.0)
+    parser.add_argument("--latencia-llm", type=float, default=0.0)
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument(
+        "--diretorio", help="pasta dos dados gerados (padrão: temporária)"
+    )
+    parser.add_argument("--saida", default="benchmark_results.json")
+    parser.add_argument("--comparar", help="relatório JSON de referência")
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str]):
+    args = parse_arguments(argv)
+    # Consultas em answer_query usam o mesmo backend de embeddings da indexação
+    os.environ["EMBEDDING_BACKEND"] = args.backend
+    os.environ["EMBEDDING_LOCAL_DIMENSAO"] = str(args.dimensao)
+
+    if args.diretorio:
+        os.makedirs(args.diretorio, exist_ok=True)
+        results = run_benchmarks(args, args.diretorio)
+    else:
+        with tempfile.TemporaryDirectory() as work_dir:
+            results = run_benchmarks(args, work_dir)
+
+    with open(args.saida, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(json.dumps(results["etapas"], indent=2, ensure_ascii=False))
+
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            compare_results(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
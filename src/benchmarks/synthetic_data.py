@@ -0,0 +1,169 @@
+import os
+import random
+from typing import List
+
+WORDS = (
+    "dados índice consulta documento função módulo arquivo vetor chunk busca "
+    "resposta contexto modelo processo tempo memória página texto código lista "
+    "valor chave cache lote erro registro análise resultado caminho usuário"
+).split()
+
+# Palavras usadas nos identificadores do código gerado (apenas ASCII)
+IDENTIFIER_WORDS = (
+    "dados indice consulta documento funcao modulo arquivo vetor chunk busca "
+    "resposta contexto modelo processo tempo memoria pagina texto codigo lista"
+).split()
+
+
+def generate_identifier(rng: random.Random, parts: int = 2) -> str:
+    return "_".join(rng.choice(IDENTIFIER_WORDS) for _ in range(parts))
+
+
+def generate_function(
+    rng: random.Random,
+    name: str,
+    statements: int,
+    documented: bool,
+    indent: str = "",
+    is_method: bool = False,
+) -> str:
+    arguments = [generate_identifier(rng, 1) + str(i) for i in range(rng.randint(0, 3))]
+    parameters = (["self"] if is_method else []) + arguments
+    lines = [f"{indent}def {name}({', '.join(parameters)}):"]
+    if documented:
+        lines.append(f'{indent}    """{" ".join(rng.choices(WORDS, k=8))}."""')
+
+    variables = arguments or ["valor"]
+    if not arguments:
+        lines.append(f"{indent}    valor = {rng.randint(0, 100)}")
+    for position in range(statements):
+        target = f"{generate_identifier(rng)}_{position}"
+        source = rng.choice(variables)
+        if position % 5 == 4:
+            lines.append(f"{indent}    if {source}:")
+            lines.append(f"{indent}        {target} = {source} * {rng.randint(2, 9)}")
+            lines.append(f"{indent}    else:")
+            lines.append(f"{indent}        {target} = {source}")
+        else:
+            lines.append(f"{indent}    {target} = {source} + {rng.randint(1, 99)}")
+        variables.append(target)
+    lines.append(f"{indent}    return {variables[-1]}")
+    return "\n".join(lines)
+
+
+def generate_module(
+    rng: random.Random, functions: int, statements: int, documented_ratio: float
+) -> str:
+    parts = ["import os\nfrom typing import List"]
+    for position in range(functions):
+        name = f"{generate_identifier(rng)}_{position}"
+        documented = rng.random() < documented_ratio
+        # Algumas funções são bem maiores que as demais, como em código real
+        function_statements = statements * (8 if rng.random() < 0.05 else 1)
+        if position % 4 == 3:
+            class_name = "".join(word.capitalize() for word in name.split("_"))
+            method = generate_function(
+                rng,
+                "processar",
+                function_statements,
+                documented,
+                indent="    ",
+                is_method=True,
+            )
+            parts.append(f"class {class_name}:\n{method}")
+        else:
+            parts.append(generate_function(rng, name, function_statements, documented))
+    return "\n\n\n".join(parts) + "\n"
+
+
+def generate_python_repository(
+    repo_path: str,
+    files: int = 200,
+    functions_per_file: int = 10,
+    statements_per_function: int = 8,
+    documented_ratio: float = 0.5,
+    files_per_package: int = 20,
+    seed: int = 0,
+) -> List[str]:
+    """Cria um repositório Python sintético e devolve os caminhos dos arquivos."""
+    rng = random.Random(seed)
+    file_names = []
+    for position in range(files):
+        package_path = os.path.join(
+            repo_path, f"pacote_{position // files_per_package}"
+        )
+        os.makedirs(package_path, exist_ok=True)
+        file_name = os.path.join(package_path, f"modulo_{position}.py")
+        with open(file_name, "w", encoding="utf-8") as f:
+            f.write(
+                generate_module(
+                    rng, functions_per_file, statements_per_function, documented_ratio
+                )
+            )
+        file_names.append(file_name)
+    return file_names
+
+
+def escape_pdf_text(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def generate_pdf(
+    pdf_path: str,
+    pages: int = 50,
+    lines_per_page: int = 40,
+    words_per_line: int = 12,
+    seed: int = 0,
+):
+    """Grava um PDF sintético com texto extraível, sem dependências externas."""
+    rng = random.Random(seed)
+    objects: List[bytes] = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"",  # Árvore de páginas, preenchida depois de conhecer as páginas
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica "
+        b"/Encoding /WinAnsiEncoding >>",
+    ]
+
+    page_numbers = []
+    for page in range(pages):
+        lines = []
+        for _ in range(lines_per_page):
+            sentence = " ".join(rng.choices(WORDS, k=words_per_line))
+            lines.append(f"({escape_pdf_text(sentence.capitalize())}.) Tj T*")
+        content = (
+            "BT /F1 10 Tf 12 TL 50 780 Td "
+            + f"(Pagina {page + 1}) Tj T* "
+            + " ".join(lines)
+            + " ET"
+        ).encode("cp1252")
+        objects.append(
+            b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream"
+        )
+        content_number = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>"
+            % content_number
+        )
+        page_numbers.append(len(objects))
+
+    kids = " ".join(f"{number} 0 R" for number in page_numbers)
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>".encode("ascii")
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+
+    xref_offset = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        output += b"%010d 00000 n \n" % offset
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1,
+        xref_offset,
+    )
+
+    with open(pdf_path, "wb") as f:
+        f.write(output)
@@ -0,0 +1,311 @@
+"""
+Linha de comando do trabalho de uso de RAG para Engenharia de Software
+
+Cada subcomando importa apenas os módulos de que precisa: listar funções sem
+documentação ou consultar as métricas não carrega FAISS, OpenAI nem PyPDF2.
+
+Uso (a partir da pasta src):
+    python -m cli index [--incremental]
+    python -m cli list-undocumented [--repositorio CAMINHO] [--json]
+    python -m cli query "pergunta" [--k 5] [--somente-chunks]
+    python -m cli apply-docstrings [--interativo]
+    python -m cli stats
+"""
+
+# pylint: disable=import-outside-toplevel
+
+import argparse
+import json
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple
+
+logger = logging.getLogger()
+
+# A análise dos arquivos em list-undocumented não escreve no log; as falhas
+# são mostradas na saída de erros
+worker_logger = logging.getLogger("cli.worker")
+worker_logger.propagate = False
+worker_logger.addHandler(logging.NullHandler())
+
+LOG_FILE_NAME = "trabalho-genai-rag-cli.log"
+
+# Artefatos gerados pela indexação, listados pelo subcomando stats
+ARTIFACT_PREFIXES = ("faiss", "bm25", "chunks", "embeddings", "manifest")
+
+
+def setup_logging():
+    from utils.custom_logging import logger_setup
+
+    logger.setLevel(logging.DEBUG)
+    logger_setup(logger, LOG_FILE_NAME)
+
+
+def command_index(args: argparse.Namespace) -> int:
+    setup_logging()
+    from utils.embeddings_processing import get_embeddings_from_code_bases
+    from utils.instrumentation import write_metrics_summary
+    from utils.llm_connection import get_llm_client
+
+    client = get_llm_client(logger)
+    _, chunks, index = get_embeddings_from_code_bases(
+        logger, client, incremental=args.incremental, update_index=True
+    )
+    write_metrics_summary(logger)
+    print(f"{index.ntotal} vetores e {len(chunks)} chunks indexados.")
+    return 0
+
+
+def find_undocumented_functions(file_name: str) -> Tuple[str, List[str], str | None]:
+    from utils.concrete_syntax_tree_parsing import extract_file_record
+
+    try:
+        with open(file_name, mode="r", encoding="utf-8") as code_file:
+            file_content = code_file.read()
+        record = extract_file_record(worker_logger, file_content, file_name)
+    except Exception as error:  # pylint: disable=broad-exception-caught
+        return file_name, [], f"{type(error).__name__}: {error}"
+
+    return file_name, record.undocumented_qualified_names, None
+
+
+def command_list_undocumented(args: argparse.Namespace) -> int:
+    from utils.environment import load_environment
+    from utils.repository_processing import get_code_repositories, iter_python_files
+
+    if args.repositorio:
+        repository_paths = [args.repositorio]
+    else:
+        repository_paths = [repository.path for repository in get_code_repositories()]
+    if len(repository_paths) == 0:
+        print("Nenhum repositório configurado (REPOSITORY_1_PATH).", file=sys.stderr)
+        return 1
+
+    load_environment()
+    max_workers = args.processos or int(
+        os.getenv("NUMERO_PROCESSOS", str(os.cpu_count() or 1))
+    )
+    file_names = [
+        file_name
+        for repository_path in repository_paths
+        for file_name in iter_python_files(logger, repository_path)
+    ]
+
+    if max_workers <= 1 or len(file_names) <= 1:
+        results = [find_undocumented_functions(file_name) for file_name in file_names]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            chunksize = max(1, len(file_names) // (max_workers * 4))
+            results = list(
+                executor.map(
+                    find_undocumented_functions, file_names, chunksize=chunksize
+                )
+            )
+
+    undocumented: dict[str, List[str]] = {}
+    failures = 0
+    for file_name, function_names, error in results:
+        if error is not None:
+            failures += 1
+            print(f"Falha ao analisar {file_name}: {error}", file=sys.stderr)
+        elif len(function_names) > 0:
+            undocumented[file_name] = function_names
+
+    if args.json:
+        print(json.dumps(undocumented, indent=2, ensure_ascii=False))
+    else:
+        for file_name, function_names in undocumented.items():
+            for function_name in function_names:
+                print(f"{file_name}: {function_name}")
+        total = sum(len(function_names) for function_names in undocumented.values())
+        print(
+            f"{total} funções sem docstring em {len(undocumented)} de "
+            f"{len(file_names)} arquivos.",
+            file=sys.stderr,
+        )
+
+    return 1 if failures > 0 else 0
+
+
+def command_query(args: argparse.Namespace) -> int:
+    setup_logging()
+    from utils.embeddings_processing import (
+        get_embeddings_from_code_bases,
+        load_code_lexical_index,
+    )
+    from utils.instrumentation import write_metrics_summary
+    from utils.lexical_index import is_hybrid_search_enabled
+    from utils.llm_connection import get_llm_client
+    from utils.query_processing import answer_query, retrieve_chunks_for_queries
+
+    client = get_llm_client(logger)
+    _, chunks, index = get_embeddings_from_code_bases(logger, client)
+    lexical_index = None
+    if is_hybrid_search_enabled():
+        lexical_index = load_code_lexical_index(logger)
+
+    if args.somente_chunks:
+        (relevant_chunks,) = retrieve_chunks_for_queries(
+            logger=logger,
+            queries=[args.pergunta],
+            index=index,
+            chunks=chunks,
+            client=client,
+            k=args.k,
+            lexical_index=lexical_index,
+        )
+        for position, chunk in enumerate(relevant_chunks, start=1):
+            print(f"--- Chunk {position} ---\n{chunk}\n")
+    else:
+        answer = answer_query(
+            logger=logger,
+            query=args.pergunta,
+            index=index,
+            chunks=chunks,
+            system_prompt=args.prompt_sistema,
+            client=client,
+            k=args.k,
+            lexical_index=lexical_index,
+        )
+        print(answer)
+
+    write_metrics_summary(logger)
+    return 0
+
+
+def command_apply_docstrings(args: argparse.Namespace) -> int:
+    import main as main_module
+
+    main_module.main(
+        main_module.Modos.ALTERACAO_CODIGO
+        if args.interativo
+        else main_module.Modos.GERACAO_EM_LOTE
+    )
+    return 0
+
+
+def format_size(size: int) -> str:
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def command_stats(args: argparse.Namespace) -> int:
+    from utils.environment import load_environment
+
+    load_environment()
+    summary_file = args.arquivo or os.getenv(
+        "METRICAS_ARQUIVO", "metricas_execucao.json"
+    )
+
+    artifacts = sorted(
+        file_name
+        for file_name in os.listdir(".")
+        if file_name.startswith(ARTIFACT_PREFIXES) and os.path.isfile(file_name)
+    )
+    print("Artefatos da indexação:")
+    for file_name in artifacts:
+        print(f"  {file_name:40} {format_size(os.path.getsize(file_name)):>10}")
+    if len(artifacts) == 0:
+        print("  nenhum (execute python -m cli index)")
+
+    if not os.path.exists(summary_file):
+        print(f"\nResumo de métricas {summary_file} não encontrado.")
+        return 0
+
+    with open(summary_file, "r", encoding="utf-8") as f:
+        summary = json.load(f)
+
+    print(
+        f"\nÚltima execução ({summary['inicio']}): {summary['duracao_total_s']:.3f} s"
+    )
+    print(f"  {'etapa':55} {'chamadas':>9} {'total (s)':>10} {'máx. (ms)':>10}")
+    for stage, statistics in summary["etapas"].items():
+        print(
+            f"  {stage:55} {statistics['chamadas']:>9} "
+            f"{statistics['tempo_total_s']:>10.3f} {statistics['tempo_max_ms']:>10.1f}"
+        )
+    for counter, value in summary["contadores"].items():
+        print(f"  {counter}: {value}")
+    for api, totals in summary["tokens"].items():
+        print(f"  tokens ({api}): {totals}")
+    return 0
+
+
+def parse_arguments(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m cli", description=__doc__.split("\n\n")[0].strip()
+    )
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    index_parser = subparsers.add_parser(
+        "index", help="cria ou atualiza o índice dos repositórios de código"
+    )
+    index_parser.add_argument(
+        "--incremental",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help="reprocessa apenas arquivos alterados (padrão: INDEXACAO_INCREMENTAL)",
+    )
+    index_parser.set_defaults(func=command_index)
+
+    list_parser = subparsers.add_parser(
+        "list-undocumented", help="lista as funções e métodos sem docstring"
+    )
+    list_parser.add_argument(
+        "--repositorio", help="pasta analisada (padrão: REPOSITORY_<N>_PATH)"
+    )
+    list_parser.add_argument(
+        "--processos", type=int, help="processos usados (padrão: NUMERO_PROCESSOS)"
+    )
+    list_parser.add_argument("--json", action="store_true", help="saída em JSON")
+    list_parser.set_defaults(func=command_list_undocumented)
+
+    query_parser = subparsers.add_parser(
+        "query", help="responde a uma pergunta usando o índice de código"
+    )
+    query_parser.add_argument("pergunta")
+    query_parser.add_argument("--k", type=int, default=5)
+    query_parser.add_argument(
+        "--somente-chunks",
+        action="store_true",
+        help="mostra os chunks recuperados sem chamar a LLM",
+    )
+    query_parser.add_argument(
+        "--prompt-sistema",
+        default="Você é um assistente de geração de documentação de códigos em Python.",
+    )
+    query_parser.set_defaults(func=command_query)
+
+    apply_parser = subparsers.add_parser(
+        "apply-docstrings", help="gera as docstrings e as insere nos arquivos"
+    )
+    apply_parser.add_argument(
+        "--interativo",
+        action="store_true",
+        help="confirma cada função antes de enviá-la (padrão: em lote)",
+    )
+    apply_parser.set_defaults(func=command_apply_docstrings)
+
+    stats_parser = subparsers.add_parser(
+        "stats", help="mostra os artefatos do índice e as métricas da última execução"
+    )
+    stats_parser.add_argument(
+        "--arquivo", help="resumo de métricas (padrão: METRICAS_ARQUIVO)"
+    )
+    stats_parser.set_defaults(func=command_stats)
+
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str]) -> int:
+    args = parse_arguments(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -6,23 +6,33 @@ para o contexto de Engenharia de Software
 """
 
 import logging
-import os
+import sys
 from typing import List, Tuple
-from dotenv import load_dotenv
 from enum import Enum
-import libcst as cst
-from utils.concrete_syntax_tree_parsing import (
-    InsertDocStringTransformer,
-    InsertDocStringVisitor,
-    get_undocumented_functions,
+from utils.batch_generation import (
+    extract_docstring_from_answer,
+    generate_docstrings_in_batch,
 )
+from utils.concrete_syntax_tree_parsing import FileRecord, insert_docstrings
 from utils.custom_logging import logger_setup
+from utils.instrumentation import write_metrics_summary
+from utils.lexical_index import is_hybrid_search_enabled
 from utils.llm_connection import get_llm_client
 from utils.embeddings_processing import (
     get_embeddings_from_code_bases,
+    load_code_lexical_index,
+)
+from utils.parallel_processing import process_files_in_parallel
+from utils.query_processing import (
+    answer_query,
+    get_completion_cache,
+    get_query_embedding_cache,
+    retrieve_chunks_for_queries,
+)
+from utils.repository_processing import (
+    get_all_python_files_from_repository,
+    get_code_repositories,
 )
-from utils.query_processing import answer_query
-from utils.repository_processing import get_all_python_files_from_repository
 
 # Configuração do logging
 logger = logging.getLogger()
@@ -32,12 +42,18 @@ logger.setLevel(logging.DEBUG)
 class Modos(Enum):
     SOMENTE_SUGESTAO = 0
     ALTERACAO_CODIGO = 1
+    # Gera todas as docstrings sem interação, com requisições concorrentes
+    GERACAO_EM_LOTE = 2
 
 
 modo = Modos.ALTERACAO_CODIGO
 
 
-def main():
+def build_docstring_query(function: str) -> str:
+    return f"Gere a docstring para essa função, no idioma inglês: \n {function}"
+
+
+def main(modo_execucao: Modos = modo):
     logger_setup(logger, "trabalho-genai-rag-dickson.log")
 
     logger.info("===============================")
@@ -46,34 +62,118 @@ def main():
 
     client = get_llm_client(logger)
 
-    _, chunks, index = get_embeddings_from_code_bases(logger, client)
+    repositories = get_code_repositories()
+    file_results_per_repository = {}
+    for repository in repositories:
+        logger.debug(
+            "Repositório sendo processado para obtenção de funções sem documentação: %s",
+            repository.path,
+        )
 
-    load_dotenv()
-    code_repository_path = os.getenv("REPOSITORY_1_PATH")
+        file_names = get_all_python_files_from_repository(logger, repository.path)
+        file_results_per_repository[repository.number] = process_files_in_parallel(
+            logger, file_names, repo_path=repository.path
+        )
 
-    logger.debug(
-        "Repositório sendo processado para obtenção de funções sem documentação: %s",
-        code_repository_path,
+    _, chunks, index = get_embeddings_from_code_bases(
+        logger,
+        client,
+        file_results=file_results_per_repository,
+        repositories=repositories,
     )
-
-    file_names = get_all_python_files_from_repository(logger, code_repository_path)
+    lexical_index = None
+    if is_hybrid_search_enabled():
+        lexical_index = load_code_lexical_index(logger, repositories)
 
     undocumented_functions: dict[str, Tuple[List[str], List[str]]] = {}
-
-    for file_name in file_names:
-        with open(file_name, mode="r", encoding="utf-8") as code_file:
-            file_content = code_file.read()
-
-        undocumented_function_and_names = get_undocumented_functions(
-            logger, code_content=file_content, file_name=file_name
+    file_records: dict[str, FileRecord] = {}
+
+    for file_result in (
+        file_result
+        for file_results in file_results_per_repository.values()
+        for file_result in file_results
+    ):
+        if file_result.error is not None or file_result.record is None:
+            continue
+
+        # Nomes qualificados evitam ambiguidade entre métodos homônimos
+        undocumented_functions[file_result.file_name] = (
+            file_result.record.undocumented_qualified_names,
+            file_result.undocumented_functions,
         )
-
-        undocumented_functions[file_name] = undocumented_function_and_names
+        file_records[file_result.file_name] = file_result.record
 
     system_prompt = (
         "Você é um assistente de geração de documentação de códigos em Python."
     )
 
+    # Recupera em lote o contexto de todas as funções: um único conjunto de
+    # requisições de embeddings e uma única busca no índice
+    queries: dict[str, List[str]] = {
+        file_name: [build_docstring_query(function) for function in item[1]]
+        for file_name, item in undocumented_functions.items()
+    }
+    all_queries = [query for file_queries in queries.values() for query in file_queries]
+    all_relevant_chunks = iter(
+        retrieve_chunks_for_queries(
+            logger=logger,
+            queries=all_queries,
+            index=index,
+            chunks=chunks,
+            client=client,
+            lexical_index=lexical_index,
+        )
+    )
+    relevant_chunks_per_file = {
+        file_name: [next(all_relevant_chunks) for _ in file_queries]
+        for file_name, file_queries in queries.items()
+    }
+
+    if modo_execucao == Modos.GERACAO_EM_LOTE:
+        generate_docstrings_in_batch(
+            logger=logger,
+            undocumented_functions=undocumented_functions,
+            file_records=file_records,
+            queries=queries,
+            relevant_chunks_per_file=relevant_chunks_per_file,
+            index=index,
+            chunks=chunks,
+            system_prompt=system_prompt,
+            client=client,
+        )
+    else:
+        generate_docstrings_interactively(
+            undocumented_functions=undocumented_functions,
+            file_records=file_records,
+            queries=queries,
+            relevant_chunks_per_file=relevant_chunks_per_file,
+            index=index,
+            chunks=chunks,
+            system_prompt=system_prompt,
+            client=client,
+            modo_execucao=modo_execucao,
+        )
+
+    get_query_embedding_cache(logger).log_statistics(logger)
+    get_completion_cache(logger).log_statistics()
+    write_metrics_summary(logger)
+
+    logger.info("Fim da execução")
+    logger.info("===============================")
+    logger.info("")
+
+
+def generate_docstrings_interactively(
+    undocumented_functions: dict[str, Tuple[List[str], List[str]]],
+    file_records: dict[str, FileRecord],
+    queries: dict[str, List[str]],
+    relevant_chunks_per_file: dict[str, List[List[str]]],
+    index,
+    chunks,
+    system_prompt: str,
+    client,
+    modo_execucao: Modos,
+):
     command = ""
     for item in undocumented_functions.items():
 
@@ -82,9 +182,7 @@ def main():
         undoc_functions = item[1][1]
 
         for pos_function, function in enumerate(undoc_functions):
-            query = (
-                f"Gere a docstring para essa função, no idioma inglês: \n {function}"
-            )
+            query = queries[file_name][pos_function]
 
             logger.info(
                 "Essa é a função que se deseja gerar uma docstring: \n%s", function
@@ -99,58 +197,36 @@ def main():
                 chunks=chunks,
                 system_prompt=system_prompt,
                 client=client,
+                relevant_chunks=relevant_chunks_per_file[file_name][pos_function],
             )
             print("\n\nResposta:\n", answer)
 
-            if modo == Modos.ALTERACAO_CODIGO:
+            if modo_execucao == Modos.ALTERACAO_CODIGO:
                 # Extrai nome
                 function_name = item[1][0][pos_function]
 
-                docstring = answer.split("\n")
-                docstring = docstring[2:-1]
-                docstring = "\n".join(docstring)
-                docstring = docstring.strip()
-
-                #  Remove leading double quotes
-                while docstring[0] == '"':
-                    docstring = docstring[1:]
-
-                #  Remove leading double quotes
-                while docstring[-1] == '"':
-                    docstring = docstring[:-1]
-
-                docstring = '"""' + docstring + '"""'
-                # docstring = "'" + docstring + "'"
-
-                functions_and_docstrings[function_name] = docstring
+                docstring = extract_docstring_from_answer(answer)
+                if docstring is not None:
+                    functions_and_docstrings[function_name] = docstring
+                else:
+                    logger.warning("Resposta sem docstring para %s", function_name)
 
             command = input("Pressione Enter para continuar ou Digite X pra sair.\n")
             if command.lower() == "x":
                 break
 
-        # InsertDocStringVisitor, InsertDocStringTransformer
-        visitor = InsertDocStringVisitor()
-        transformer = InsertDocStringTransformer(
-            visitor=visitor,
-            functions_and_docstrings=functions_and_docstrings,
-        )
-        with open(file_name, mode="r", encoding="utf-8") as code_file:
-            file_content = code_file.read()
-        source_tree = cst.parse_module(source=file_content)
-        modified_tree = source_tree.visit(transformer)
-
-        file_reconstructed = modified_tree.code
+        if len(functions_and_docstrings) > 0:
+            file_reconstructed = insert_docstrings(
+                logger, file_records[file_name], functions_and_docstrings
+            )
 
-        with open(file_name, "w", encoding="utf-8") as f:  # filename output
-            f.write(file_reconstructed)
+            with open(file_name, "w", encoding="utf-8") as f:  # filename output
+                f.write(file_reconstructed)
 
         if command.lower() == "x":
             break
 
-    logger.info("Fim da execução")
-    logger.info("===============================")
-    logger.info("")
-
 
 if __name__ == "__main__":
-    main()
+    # python -m main --lote: geração não interativa de todas as docstrings
+    main(Modos.GERACAO_EM_LOTE if "--lote" in sys.argv[1:] else modo)
@@ -10,9 +10,14 @@ Modificações feitas por Dickson Souza podem ser conferidas no histórico de co
 
 import logging
 from utils.custom_logging import logger_setup
+from utils.instrumentation import write_metrics_summary
 from utils.llm_connection import get_llm_client
 from utils.embeddings_processing import get_embeddings_from_PDF_files
-from utils.query_processing import answer_query
+from utils.query_processing import (
+    answer_query,
+    get_completion_cache,
+    get_query_embedding_cache,
+)
 
 # Configuração do logging
 logger = logging.getLogger()
@@ -50,6 +55,10 @@ def main():
         )
         print("\nResposta:\n", answer)
 
+    get_query_embedding_cache(logger).log_statistics(logger)
+    get_completion_cache(logger).log_statistics()
+    write_metrics_summary(logger)
+
     logger.info("Fim da execução")
     logger.info("===============================")
     logger.info("")
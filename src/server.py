@@ -0,0 +1,90 @@
+"""
+Servidor de consultas para o trabalho de uso de RAG para Engenharia de Software
+
+Carrega o cliente da OpenAI, o índice FAISS e os chunks uma única vez e
+responde a consultas por HTTP local (ou socket Unix), para que integrações
+com editores e jobs de CI não paguem o custo de inicialização a cada pergunta.
+
+Uso (a partir da pasta src):
+    python -m server
+"""
+
+import logging
+from utils.custom_logging import logger_setup
+from utils.embeddings_processing import (
+    get_embeddings_from_code_bases,
+    get_embeddings_from_PDF_files,
+    load_code_lexical_index,
+)
+from utils.instrumentation import write_metrics_summary
+from utils.lexical_index import is_hybrid_search_enabled
+from utils.llm_connection import get_llm_client
+from utils.query_server import (
+    DEFAULT_SYSTEM_PROMPT,
+    QueryService,
+    ServerSettings,
+    create_server,
+)
+
+# Configuração do logging
+logger = logging.getLogger()
+logger.setLevel(logging.DEBUG)
+
+PDF_SYSTEM_PROMPT = (
+    "Você é um jogador profissional de xadrez e também cientista da computação."
+)
+
+
+def load_query_service(settings: ServerSettings) -> QueryService:
+    client = get_llm_client(logger)
+
+    if settings.corpus == "pdf":
+        _, chunks, index = get_embeddings_from_PDF_files(logger, client)
+        return QueryService(
+            logger, client, index, chunks, system_prompt=PDF_SYSTEM_PROMPT
+        )
+
+    _, chunks, index = get_embeddings_from_code_bases(logger, client)
+    lexical_index = None
+    if is_hybrid_search_enabled():
+        lexical_index = load_code_lexical_index(logger)
+    return QueryService(
+        logger,
+        client,
+        index,
+        chunks,
+        lexical_index=lexical_index,
+        system_prompt=DEFAULT_SYSTEM_PROMPT,
+    )
+
+
+def main():
+    logger_setup(logger, "trabalho-genai-rag-servidor.log")
+
+    logger.info("===============================")
+    logger.info("Início do servidor de consultas")
+    logger.info("")
+
+    settings = ServerSettings.from_environment()
+    service = load_query_service(settings)
+    server = create_server(service, settings)
+
+    address = settings.socket_path or f"http://{settings.host}:{settings.port}"
+    logger.info(
+        "Servidor pronto em %s com %d chunks indexados.", address, len(service.chunks)
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Encerrando o servidor de consultas.")
+    finally:
+        server.server_close()
+        write_metrics_summary(logger)
+
+    logger.info("Fim da execução")
+    logger.info("===============================")
+    logger.info("")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import textwrap
+import libcst as cst
+import pytest
+import tiktoken
+from utils import token_counting
+from utils.chunk_processing import split_function_by_statements, split_lines_by_tokens
+
+# Corpo longo o bastante para que o bloco try ultrapasse o limite de tokens
+LONG_BODY = "\n".join(f"value_{i} = compute(value_{i - 1}, {i})" for i in range(1, 30))
+
+TRY_STATEMENTS = {
+    "try_finally": """
+        try:
+        {body}
+        finally:
+            cleanup()
+        """,
+    "try_except_finally": """
+        try:
+        {body}
+        except ValueError:
+            handle()
+        finally:
+            cleanup()
+        """,
+    "try_except_else": """
+        try:
+        {body}
+        except ValueError:
+            handle()
+        else:
+            done()
+        """,
+}
+
+
+def build_function(try_statement: str) -> str:
+    statement = textwrap.dedent(try_statement).strip("\n")
+    statement = statement.replace("{body}", textwrap.indent(LONG_BODY, "    "))
+    return (
+        'def process(data):\n    """Processa os dados."""\n'
+        + textwrap.indent(statement, "    ")
+        + "\n"
+    )
+
+
+@pytest.mark.parametrize("try_statement", TRY_STATEMENTS.values(), ids=TRY_STATEMENTS)
+def test_split_function_with_oversized_try_keeps_valid_fragments(try_statement):
+    function_code = build_function(try_statement)
+
+    fragments = split_function_by_statements(function_code, max_tokens=80)
+
+    assert len(fragments) > 1
+    for fragment in fragments:
+        cst.parse_module(fragment)
+    joined = "\n".join(fragments)
+    for line in LONG_BODY.split("\n"):
+        assert line in joined
+
+
+@pytest.fixture(name="byte_encoding")
+def fixture_byte_encoding(monkeypatch):
+    # Codificação de um token por byte, sem baixar os arquivos do tiktoken: o
+    # teste passa pelo mesmo caminho do modelo real
+    encoding = tiktoken.Encoding(
+        name="bytes",
+        pat_str=r"\S+|\s+",
+        mergeable_ranks={bytes([byte]): byte for byte in range(256)},
+        special_tokens={},
+    )
+    monkeypatch.setattr(token_counting, "_get_encoding", lambda model: encoding)
+
+
+@pytest.mark.usefixtures("byte_encoding")
+def test_split_lines_when_the_signature_uses_the_whole_limit():
+    parameters = ", ".join(f"parameter_{i}: int = {i}" for i in range(20))
+    signature = f"def process({parameters}):"
+    line = "    return " + " + ".join(f"parameter_{i}" for i in range(20))
+
+    fragments = split_lines_by_tokens(
+        line, signature, max_tokens=10, model="text-embedding-3-small"
+    )
+
+    assert len(fragments) > 1
+    parts = [fragment[len(signature) + 1 :] for fragment in fragments]
+    assert all(fragment.startswith(signature + "\n") for fragment in fragments)
+    assert "".join(parts) == line
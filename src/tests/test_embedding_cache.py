@@ -0,0 +1,22 @@
+import logging
+from utils.embedding_cache import EmbeddingCache, get_cache_key
+
+MODEL = "text-embedding-3-small"
+
+logger = logging.getLogger("tests")
+
+
+def test_cache_key_keeps_indentation():
+    inner = "if ready:\n    run()\n    stop()"
+    outer = "if ready:\n    run()\nstop()"
+
+    assert get_cache_key(MODEL, 1536, inner) != get_cache_key(MODEL, 1536, outer)
+
+
+def test_chunks_differing_only_in_indentation_keep_their_own_embeddings(tmp_path):
+    cache = EmbeddingCache(logger, cache_file=str(tmp_path / "cache.sqlite"))
+    texts = ["for item in items:\n    a()\n    b()", "for item in items:\n    a()\nb()"]
+    cache.put_many(MODEL, texts, [[1.0, 0.0], [0.0, 1.0]], dimension=2)
+
+    assert cache.get_many(MODEL, texts, dimension=2) == [[1.0, 0.0], [0.0, 1.0]]
+    cache.close()
@@ -0,0 +1,116 @@
+import logging
+import os
+import numpy as np
+import pytest
+from utils.embeddings_processing import (
+    get_embeddings_from_code_bases,
+    get_index_file,
+    get_storage_format,
+    load_code_lexical_index,
+)
+from utils.indexing import ShardedIndex, search_index
+from utils.repository_processing import CodeRepository
+
+logger = logging.getLogger("tests")
+
+DOCUMENTED_CODE = '''
+def add(a, b):
+    """Soma dois números."""
+    return a + b
+'''
+
+UNDOCUMENTED_CODE = """
+def sub(a, b):
+    return a - b
+"""
+
+
+@pytest.fixture(name="repositories", params=["pickle", "mmap"])
+def fixture_repositories(request, tmp_path, monkeypatch):
+    documented = tmp_path / "documentado"
+    undocumented = tmp_path / "sem_docstrings"
+    documented.mkdir()
+    undocumented.mkdir()
+    (documented / "soma.py").write_text(DOCUMENTED_CODE, encoding="utf-8")
+    (undocumented / "subtracao.py").write_text(UNDOCUMENTED_CODE, encoding="utf-8")
+
+    # Artefatos e caches são gravados na pasta atual
+    artifacts = tmp_path / "artefatos"
+    artifacts.mkdir()
+    monkeypatch.chdir(artifacts)
+    monkeypatch.setenv("EMBEDDING_BACKEND", "local")
+    monkeypatch.setenv("EMBEDDING_LOCAL_DIMENSAO", "32")
+    monkeypatch.setenv("NUMERO_PROCESSOS", "1")
+    # No formato mmap a indexação é feita em streaming
+    monkeypatch.setenv("FORMATO_ARMAZENAMENTO", request.param)
+
+    return [
+        CodeRepository(1, str(undocumented)),
+        CodeRepository(2, str(documented)),
+    ]
+
+
+def test_repository_without_chunks_is_left_out_of_the_shards(repositories):
+    _, chunks, index = get_embeddings_from_code_bases(
+        logger, client=None, incremental=False, repositories=repositories
+    )
+
+    assert not isinstance(index, ShardedIndex)
+    assert index.ntotal == 1
+    assert len(chunks) == 1
+    assert load_code_lexical_index(logger, repositories) is not None
+    # Nenhum artefato é gravado para o repositório vazio
+    assert not os.path.exists(get_index_file("_code", get_storage_format()))
+
+
+def test_only_empty_repositories_give_an_empty_searchable_index(repositories):
+    _, chunks, index = get_embeddings_from_code_bases(
+        logger, client=None, incremental=False, repositories=repositories[:1]
+    )
+
+    assert len(chunks) == 0
+    assert index.ntotal == 0
+    ids, _ = search_index(logger, index, np.zeros(32, dtype=np.float32).tolist())
+    assert all(chunk_id < 0 for chunk_id in ids)
+
+
+def test_each_storage_format_keeps_its_own_index(repositories, monkeypatch):
+    documented = repositories[1:]
+    for storage_format in ("pickle", "mmap"):
+        monkeypatch.setenv("FORMATO_ARMAZENAMENTO", storage_format)
+        get_embeddings_from_code_bases(
+            logger, client=None, incremental=False, repositories=documented
+        )
+
+    assert os.path.exists(get_index_file("_code_2", "pickle"))
+    assert os.path.exists(get_index_file("_code_2", "mmap"))
+    for storage_format in ("pickle", "mmap"):
+        monkeypatch.setenv("FORMATO_ARMAZENAMENTO", storage_format)
+        _, chunks, index = get_embeddings_from_code_bases(
+            logger, client=None, incremental=False, repositories=documented
+        )
+        assert index.ntotal == len(chunks) == 1
+
+
+def test_incremental_index_is_only_updated_when_requested(repositories):
+    documented = repositories[1:]
+    get_embeddings_from_code_bases(
+        logger, client=None, incremental=True, repositories=documented
+    )
+    new_file = os.path.join(documented[0].path, "outra_soma.py")
+    with open(new_file, "w", encoding="utf-8") as f:
+        f.write(DOCUMENTED_CODE.replace("def add", "def add_again"))
+
+    _, chunks, _ = get_embeddings_from_code_bases(
+        logger, client=None, incremental=True, repositories=documented
+    )
+    assert len(chunks) == 1
+
+    _, chunks, index = get_embeddings_from_code_bases(
+        logger,
+        client=None,
+        incremental=True,
+        repositories=documented,
+        update_index=True,
+    )
+    assert len(chunks) == index.ntotal == 2
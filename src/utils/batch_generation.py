@@ -0,0 +1,198 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Tuple
+from utils.environment import load_environment
+from utils.context_building import ContextSettings, build_context
+from utils.concrete_syntax_tree_parsing import FileRecord, insert_docstrings
+from utils.instrumentation import measure
+from utils.query_processing import answer_query
+from utils.token_counting import count_tokens
+
+# Estimativa de tokens gerados por resposta, usada para reservar a cota de TPM
+EXPECTED_COMPLETION_TOKENS = 300
+
+
+class RateLimiter:
+    """Limita as chamadas à API por requisições e por tokens por minuto.
+
+    Usa dois baldes de fichas reabastecidos continuamente; ``acquire`` bloqueia
+    a thread chamadora até que haja cota para uma requisição com a quantidade
+    de tokens informada.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.available_requests = float(requests_per_minute)
+        self.available_tokens = float(tokens_per_minute)
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self.last_refill
+        self.last_refill = now
+        self.available_requests = min(
+            self.requests_per_minute,
+            self.available_requests + elapsed * self.requests_per_minute / 60,
+        )
+        self.available_tokens = min(
+            self.tokens_per_minute,
+            self.available_tokens + elapsed * self.tokens_per_minute / 60,
+        )
+
+    def acquire(self, tokens: int = 0):
+        # Uma requisição maior que a cota inteira nunca seria liberada
+        tokens = min(tokens, self.tokens_per_minute)
+
+        while True:
+            with self.lock:
+                self._refill()
+                if self.available_requests >= 1 and self.available_tokens >= tokens:
+                    self.available_requests -= 1
+                    self.available_tokens -= tokens
+                    return
+
+                wait_time = max(
+                    (1 - self.available_requests) * 60 / self.requests_per_minute,
+                    (tokens - self.available_tokens) * 60 / self.tokens_per_minute,
+                )
+            time.sleep(wait_time)
+
+
+def get_rate_limiter() -> RateLimiter:
+    load_environment()
+    return RateLimiter(
+        requests_per_minute=int(os.getenv("OPENAI_LIMITE_RPM", "500")),
+        tokens_per_minute=int(os.getenv("OPENAI_LIMITE_TPM", "200000")),
+    )
+
+
+def extract_docstring_from_answer(answer: str) -> str | None:
+    # A resposta vem em um bloco de código: descarta as duas primeiras linhas
+    # e a última (delimitadores do bloco e da docstring)
+    docstring = answer.split("\n")
+    docstring = docstring[2:-1]
+    docstring = "\n".join(docstring)
+    docstring = docstring.strip().strip('"')
+
+    if len(docstring) == 0:
+        return None
+
+    return '"""' + docstring + '"""'
+
+
+def generate_docstrings_in_batch(
+    logger,
+    undocumented_functions: dict[str, Tuple[List[str], List[str]]],
+    file_records: dict[str, FileRecord],
+    queries: dict[str, List[str]],
+    relevant_chunks_per_file: dict[str, List[List[str]]],
+    index,
+    chunks,
+    system_prompt: str,
+    client,
+    max_workers: int | None = None,
+    rate_limiter: RateLimiter | None = None,
+) -> int:
+    if max_workers is None:
+        load_environment()
+        max_workers = int(os.getenv("GERACAO_MAX_CONCORRENCIA", "8"))
+    if rate_limiter is None:
+        rate_limiter = get_rate_limiter()
+    context_settings = ContextSettings.from_environment()
+
+    def generate(file_name: str, position: int) -> str:
+        query = queries[file_name][position]
+        # O contexto é montado antes para reservar só os tokens que serão enviados
+        relevant_chunks, context = build_context(
+            logger,
+            relevant_chunks_per_file[file_name][position],
+            context_settings,
+        )
+
+        estimated_tokens = (
+            count_tokens(system_prompt, "gpt-4o-mini")
+            + count_tokens(query, "gpt-4o-mini")
+            + count_tokens(context, "gpt-4o-mini")
+            + EXPECTED_COMPLETION_TOKENS
+        )
+        with measure("batch_generation.espera_limite_de_taxa"):
+            rate_limiter.acquire(estimated_tokens)
+
+        return answer_query(
+            logger=logger,
+            query=query,
+            index=index,
+            chunks=chunks,
+            system_prompt=system_prompt,
+            client=client,
+            relevant_chunks=relevant_chunks,
+            context_settings=context_settings,
+        )
+
+    total_functions = sum(len(item[1]) for item in undocumented_functions.values())
+    logger.info(
+        "Gerando docstrings para %d funções com até %d requisições simultâneas.",
+        total_functions,
+        max_workers,
+    )
+
+    pending_per_file = {
+        file_name: len(item[1])
+        for file_name, item in undocumented_functions.items()
+        if len(item[1]) > 0
+    }
+    docstrings_per_file: dict[str, dict[str, str]] = {
+        file_name: {} for file_name in pending_per_file
+    }
+    generated = 0
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(generate, file_name, position): (file_name, position)
+            for file_name in pending_per_file
+            for position in range(pending_per_file[file_name])
+        }
+
+        for future in as_completed(futures):
+            file_name, position = futures[future]
+            function_name = undocumented_functions[file_name][0][position]
+
+            try:
+                docstring = extract_docstring_from_answer(future.result())
+            except Exception as error:  # pylint: disable=broad-exception-caught
+                logger.error(
+                    "Falha ao gerar a docstring de %s em %s: %s",
+                    function_name,
+                    file_name,
+                    error,
+                )
+                docstring = None
+
+            if docstring is not None:
+                docstrings_per_file[file_name][function_name] = docstring
+                generated += 1
+
+            pending_per_file[file_name] -= 1
+            if pending_per_file[file_name] > 0:
+                continue
+
+            # Todas as funções do arquivo foram processadas: grava o resultado
+            functions_and_docstrings = docstrings_per_file.pop(file_name)
+            if len(functions_and_docstrings) > 0:
+                file_reconstructed = insert_docstrings(
+                    logger, file_records[file_name], functions_and_docstrings
+                )
+                with open(file_name, "w", encoding="utf-8") as f:
+                    f.write(file_reconstructed)
+            logger.info(
+                "Arquivo %s atualizado com %d docstrings.",
+                file_name,
+                len(functions_and_docstrings),
+            )
+
+    logger.info("Docstrings geradas: %d de %d.", generated, total_functions)
+    return generated
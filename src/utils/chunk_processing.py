@@ -1,62 +1,297 @@
 import re
+import textwrap
+from collections import deque
+from typing import Any, Iterable, Iterator, List, Tuple
 import libcst as cst
-from typing import List
 
-from utils.concrete_syntax_tree_parsing import (
-    FunctionWithDocsStrings,
-    RemoveFunctionsWithoutDocStrings,
-)
+from utils.concrete_syntax_tree_parsing import FileRecord, extract_file_record
+from utils.instrumentation import timed
+from utils.token_counting import count_tokens, split_text_by_tokens
 
+# Tamanho alvo dos chunks de texto, em tokens do modelo de embeddings, e
+# quantidade de tokens repetida entre chunks consecutivos
+CHUNK_MAX_TOKENS = 1000
+CHUNK_OVERLAP_TOKENS = 100
 
-def split_text_into_chunks(logger, text: str, max_chunk_size: int = 5000) -> List[str]:
+
+@timed
+def split_text_into_chunks(
+    logger,
+    text: str,
+    max_tokens: int = CHUNK_MAX_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+    model: str = "text-embedding-3-small",
+) -> Iterator[str]:
     logger.info("Dividindo o texto em chunks.")
 
-    sentences = re.split(r"(?<=[.?!])\s+", text)
-    chunks = []
-    current_chunk = ""
-    for sentence in sentences:
-        if len(current_chunk) + len(sentence) <= max_chunk_size:
-            current_chunk += " " + sentence
-        else:
-            chunks.append(current_chunk.strip())
-            current_chunk = sentence
-    if current_chunk:
-        chunks.append(current_chunk.strip())
-    logger.info("Total de chunks criados: %d", len(chunks))
-    return chunks
+    for _, chunk in iter_token_chunks(
+        logger, [(None, text)], max_tokens, overlap_tokens, model
+    ):
+        yield chunk
+
+
+@timed
+def iter_page_chunks(
+    logger,
+    pages: Iterable[Tuple[int, str]],
+    max_tokens: int = CHUNK_MAX_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+    model: str = "text-embedding-3-small",
+) -> Iterator[Tuple[int, str]]:
+    logger.info("Dividindo as páginas do documento em chunks.")
+
+    yield from iter_token_chunks(logger, pages, max_tokens, overlap_tokens, model)
+
+
+def iter_token_chunks(
+    logger,
+    segments: Iterable[Tuple[Any, str]],
+    max_tokens: int = CHUNK_MAX_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+    model: str = "text-embedding-3-small",
+) -> Iterator[Tuple[Any, str]]:
+    """Divide um fluxo de (metadado, texto) em chunks de até ``max_tokens``.
+
+    Os chunks respeitam limites de sentença, e as últimas sentenças de cada
+    chunk, até ``overlap_tokens``, são repetidas no início do seguinte. Cada
+    sentença é contada uma única vez e cada chunk é montado com um único
+    ``join``, em tempo linear. O metadado de um chunk (por exemplo, o número
+    da página) é o da sua primeira sentença.
+    """
+    window: deque[Tuple[Any, str, int]] = deque()
+    window_tokens = 0
+    total_chunks = 0
+    # Sentenças que ainda não saíram em nenhum chunk; evita repetir um chunk
+    # formado apenas pela sobreposição
+    new_sentences = 0
+
+    def sentences_of(segment_metadata, text: str):
+        for sentence in re.split(r"(?<=[.?!])\s+", text):
+            if len(sentence.strip()) == 0:
+                continue
+            # +1 pelo espaço que separa a sentença da anterior no chunk
+            sentence_tokens = count_tokens(sentence, model) + 1
+            if sentence_tokens <= max_tokens:
+                yield segment_metadata, sentence, sentence_tokens
+                continue
+            # Sentença maior que o limite: cortada em janelas de tokens
+            for part in split_text_by_tokens(sentence, max_tokens - 1, model):
+                yield segment_metadata, part, count_tokens(part, model) + 1
+
+    for segment_metadata, text in segments:
+        for sentence in sentences_of(segment_metadata, text):
+            if new_sentences > 0 and window_tokens + sentence[2] > max_tokens:
+                yield window[0][0], " ".join(item[1] for item in window).strip()
+                total_chunks += 1
+                new_sentences = 0
+
+                while len(window) > 0 and (
+                    window_tokens > overlap_tokens
+                    or window_tokens + sentence[2] > max_tokens
+                ):
+                    window_tokens -= window.popleft()[2]
 
+            window.append(sentence)
+            window_tokens += sentence[2]
+            new_sentences += 1
 
+    if new_sentences > 0:
+        yield window[0][0], " ".join(item[1] for item in window).strip()
+        total_chunks += 1
+
+    logger.info("Total de chunks criados: %d", total_chunks)
+
+
+# Tamanho máximo de um chunk de código, em tokens do modelo de embeddings
+CODE_CHUNK_MAX_TOKENS = 1500
+
+
+@timed
 def split_code_into_chunks(
-    logger, code_content: str, file_name: str, max_chunk_size: int = 5000
+    logger,
+    code_content: str,
+    file_name: str,
+    max_chunk_tokens: int = CODE_CHUNK_MAX_TOKENS,
+    record: FileRecord | None = None,
+    model: str = "text-embedding-3-small",
 ) -> List[str]:
     logger.info("Dividindo o código-fonte do arquivo %s em chunks.", file_name)
 
-    source_tree = cst.parse_module(source=code_content)
-
-    visitor = FunctionWithDocsStrings()
-    transformer = RemoveFunctionsWithoutDocStrings(visitor)
-    modified_tree = source_tree.visit(transformer)
+    if record is None:
+        record = extract_file_record(logger, code_content, file_name)
 
-    function_chunks = transformer.function_chunks
+    function_chunks = record.documented_chunks
 
     chunks = []
     for function_chunk in function_chunks:
-        if len(function_chunk) <= max_chunk_size:
+        if count_tokens(function_chunk, model) <= max_chunk_tokens:
             chunks.append(function_chunk)
         else:
-            splitted_function = function_chunk.split("\n")
-
-            partial_chunk = ""
-            for splitted_line in splitted_function:
-                if len(partial_chunk) + len(splitted_line) + 1 <= max_chunk_size:
-                    partial_chunk += "\n" + splitted_line
-                else:
-                    if len(partial_chunk) > 0:
-                        chunks.append(partial_chunk)
-                    partial_chunk = splitted_line
-
-            if len(partial_chunk) > 0:
-                chunks.append(partial_chunk)
+            fragments = split_function_by_statements(
+                function_chunk, max_chunk_tokens, model
+            )
+            logger.debug(
+                "Função com mais de %d tokens dividida em %d partes no arquivo %s.",
+                max_chunk_tokens,
+                len(fragments),
+                file_name,
+            )
+            chunks.extend(fragments)
 
     logger.debug("Total de chunks criados: %d", len(chunks))
     return chunks
+
+
+def split_function_by_statements(
+    function_code: str, max_tokens: int, model: str = "text-embedding-3-small"
+) -> List[str]:
+    """Divide uma função grande em fragmentos válidos nos limites de comandos.
+
+    Cada fragmento repete a assinatura da função (com os decoradores) e contém
+    um subconjunto contíguo dos comandos do corpo. Blocos compostos grandes
+    (if, for, with, try...) são divididos recursivamente da mesma forma. O que
+    ainda exceder o limite é cortado por linhas e, em último caso, por tokens.
+    """
+    module = cst.parse_module(function_code)
+    function = module.body[-1] if len(module.body) > 0 else None
+    if not isinstance(function, cst.FunctionDef):
+        return split_lines_by_tokens(function_code, "", max_tokens, model)
+
+    # Assinatura com decoradores: a função renderizada com o corpo "..." menos a
+    # última linha
+    elided_function = function.with_changes(
+        body=cst.IndentedBlock(
+            body=[cst.SimpleStatementLine([cst.Expr(cst.Ellipsis())])]
+        ),
+        leading_lines=[],
+    )
+    signature = module.code_for_node(elided_function).rstrip().rsplit("\n", 1)[0]
+
+    fragments = []
+    for node in split_node_by_statements(module, function, max_tokens, model):
+        fragment = module.code_for_node(node)
+        if count_tokens(fragment, model) <= max_tokens:
+            fragments.append(fragment)
+        else:
+            fragment = fragment.strip("\n")
+            if fragment.startswith(signature):
+                fragment = fragment[len(signature) :].lstrip("\n")
+            fragments.extend(
+                split_lines_by_tokens(fragment, signature, max_tokens, model)
+            )
+
+    return fragments
+
+
+def split_node_by_statements(
+    module: cst.Module, node: cst.CSTNode, max_tokens: int, model: str, depth: int = 0
+) -> List[cst.CSTNode]:
+    def tokens_of(current_node: cst.CSTNode, indentation: str = "") -> int:
+        code = module.code_for_node(current_node)
+        if len(indentation) > 0:
+            # Os comandos do corpo aparecem indentados no fragmento final
+            code = textwrap.indent(code, indentation)
+        return count_tokens(code, model)
+
+    body = getattr(node, "body", None)
+    if tokens_of(node) <= max_tokens or not isinstance(body, cst.IndentedBlock):
+        return [node]
+
+    # Cláusulas adicionais (else, except, finally) são tratadas à parte
+    has_extra_clauses = any(
+        getattr(node, attribute, None)
+        for attribute in ("orelse", "handlers", "finalbody")
+    )
+
+    def without_clauses(
+        current_node: cst.CSTNode, new_body: cst.IndentedBlock
+    ) -> cst.CSTNode:
+        if isinstance(current_node, (cst.Try, cst.TryStar)):
+            # Um try sem except precisa de finally para ser válido; o try* sem
+            # except* não existe e vira um try comum
+            return cst.Try(
+                body=new_body,
+                finalbody=cst.Finally(
+                    body=cst.IndentedBlock(body=[cst.SimpleStatementLine([cst.Pass()])])
+                ),
+                leading_lines=current_node.leading_lines,
+            )
+        if getattr(current_node, "orelse", None):
+            return current_node.with_changes(body=new_body, orelse=None)
+        return current_node.with_changes(body=new_body)
+
+    elided_body = body.with_changes(
+        body=[cst.SimpleStatementLine([cst.Expr(cst.Ellipsis())])]
+    )
+    header_tokens = tokens_of(
+        without_clauses(node, elided_body).with_changes(leading_lines=[])
+    )
+    budget = max(1, max_tokens - header_tokens)
+    body_indentation = module.default_indent * (depth + 1)
+
+    groups: List[List[cst.BaseStatement]] = []
+    current_group: List[cst.BaseStatement] = []
+    current_tokens = 0
+    for statement in body.body:
+        statement_tokens = tokens_of(statement, body_indentation)
+
+        if statement_tokens > budget:
+            if len(current_group) > 0:
+                groups.append(current_group)
+                current_group = []
+                current_tokens = 0
+            for part in split_node_by_statements(
+                module, statement, budget, model, depth + 1
+            ):
+                groups.append([part])
+            continue
+
+        if len(current_group) > 0 and current_tokens + statement_tokens > budget:
+            groups.append(current_group)
+            current_group = []
+            current_tokens = 0
+
+        current_group.append(statement)
+        current_tokens += statement_tokens
+
+    if len(current_group) > 0:
+        groups.append(current_group)
+
+    nodes = [without_clauses(node, body.with_changes(body=group)) for group in groups]
+    if has_extra_clauses:
+        nodes.append(node.with_changes(body=elided_body))
+
+    return nodes
+
+
+def split_lines_by_tokens(
+    code: str, signature: str, max_tokens: int, model: str
+) -> List[str]:
+    # Último recurso: corta por linhas, repetindo a assinatura em cada parte
+    header = signature + "\n" if len(signature) > 0 else ""
+    budget = max(1, max_tokens - count_tokens(header, model))
+
+    fragments = []
+    current_lines: List[str] = []
+    current_tokens = 0
+    for line in code.split("\n"):
+        line_tokens = count_tokens(line, model) + 1
+        if line_tokens > budget:
+            # A assinatura sozinha pode ocupar todo o limite; cada parte ainda
+            # precisa de ao menos um token
+            for part in split_text_by_tokens(line, max(1, budget - 1), model):
+                fragments.append(header + part)
+            continue
+
+        if len(current_lines) > 0 and current_tokens + line_tokens > budget:
+            fragments.append(header + "\n".join(current_lines))
+            current_lines = []
+            current_tokens = 0
+
+        current_lines.append(line)
+        current_tokens += line_tokens
+
+    if len(current_lines) > 0:
+        fragments.append(header + "\n".join(current_lines))
+
+    return fragments
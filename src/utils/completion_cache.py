@@ -0,0 +1,108 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import List
+
+
+def get_completion_key(
+    model: str, system_prompt: str, chunk_ids: List[str], query: str
+) -> str:
+    query_hash = hashlib.sha256(query.encode("utf-8")).hexdigest()
+    payload = json.dumps([model, system_prompt, chunk_ids, query_hash])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def get_chunk_id(chunk: str) -> str:
+    # Identificador pelo conteúdo: continua válido mesmo que o índice seja
+    # reconstruído e as posições dos chunks mudem
+    return hashlib.sha256(chunk.encode("utf-8")).hexdigest()[:16]
+
+
+class CompletionCache:
+    """Cache persistente das respostas da LLM.
+
+    As entradas expiram após ``ttl_seconds`` e, acima de ``max_entries``, as
+    menos usadas recentemente são removidas.
+    """
+
+    def __init__(
+        self,
+        logger,
+        cache_file: str = "completions_cache.sqlite",
+        ttl_seconds: float = 7 * 24 * 3600,
+        max_entries: int = 100_000,
+    ):
+        self.logger = logger
+        self.cache_file = cache_file
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        self.connection = sqlite3.connect(cache_file, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS completions ("
+            "key TEXT PRIMARY KEY, answer TEXT NOT NULL, "
+            "created REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS completions_last_access "
+            "ON completions (last_access)"
+        )
+        self.connection.commit()
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT answer, created FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None or now - row[1] > self.ttl_seconds:
+                self.misses += 1
+                return None
+
+            self.connection.execute(
+                "UPDATE completions SET last_access = ? WHERE key = ?", (now, key)
+            )
+            self.connection.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, answer: str):
+        now = time.time()
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO completions (key, answer, created, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                (key, answer, now, now),
+            )
+            self.connection.execute(
+                "DELETE FROM completions WHERE created < ?", (now - self.ttl_seconds,)
+            )
+            (count,) = self.connection.execute(
+                "SELECT COUNT(*) FROM completions"
+            ).fetchone()
+            if count > self.max_entries:
+                self.connection.execute(
+                    "DELETE FROM completions WHERE key IN ("
+                    "SELECT key FROM completions ORDER BY last_access LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+            self.connection.commit()
+
+    def log_statistics(self):
+        total = self.hits + self.misses
+        self.logger.info(
+            "Cache de respostas da LLM: %d acertos, %d falhas (taxa de acerto %.1f%%).",
+            self.hits,
+            self.misses,
+            100 * self.hits / total if total > 0 else 0.0,
+        )
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -1,6 +1,7 @@
-from collections.abc import Sequence
-from dill.pointers import children
+from dataclasses import dataclass, field
+from typing import List
 import libcst as cst
+from libcst.metadata import MetadataWrapper, PositionProvider
 
 
 class TypingCollector(cst.CSTVisitor):
@@ -95,30 +96,69 @@ class FunctionWithDocsStrings(cst.CSTVisitor):
 
 
 class RemoveFunctionsWithoutDocStrings(cst.CSTTransformer):
-    def __init__(self, visitor):
+    METADATA_DEPENDENCIES = (PositionProvider,)
+
+    def __init__(self, visitor, module: cst.Module | None = None):
         self.visitor = visitor
+        # Módulo usado para gerar o código de cada função; mantém a indentação
+        # e as quebras de linha do arquivo original
+        self.module = module if module is not None else cst.Module([])
         self.function_chunks: list[str] = []
         self.undocumented_functions: list[str] = []
         self.undocumented_function_names: list[str] = []
+        self.functions: list[FunctionRecord] = []
+        self.stack: list[str] = []
+
+    def visit_ClassDef(self, node: cst.ClassDef) -> bool | None:
+        self.stack.append(node.name.value)
+
+    def leave_ClassDef(
+        self, original_node: cst.ClassDef, updated_node: cst.ClassDef
+    ) -> (
+        cst.BaseStatement | cst.FlattenSentinel[cst.BaseStatement] | cst.RemovalSentinel
+    ):
+        self.stack.pop()
+        return updated_node
+
+    def visit_FunctionDef(self, node: cst.FunctionDef) -> bool | None:
+        self.stack.append(node.name.value)
 
     def leave_FunctionDef(
         self, original_node: cst.FunctionDef, updated_node: cst.FunctionDef
     ) -> (
         cst.BaseStatement | cst.FlattenSentinel[cst.BaseStatement] | cst.RemovalSentinel
     ):
+        qualified_name = ".".join(self.stack)
+        self.stack.pop()
+
+        # As posições só estão disponíveis quando a árvore é visitada por um MetadataWrapper
+        position = self.get_metadata(PositionProvider, original_node, None)
+        start_line = position.start.line if position is not None else 0
+        end_line = position.end.line if position is not None else 0
+
         docstring = original_node.get_docstring()
+        # https://stackoverflow.com/questions/60867937/libcst-converting-arbitrary-nodes-to-code/63421188#63421188
+        code = self.module.code_for_node(original_node)
+        documented = docstring is not None and len(docstring.strip()) > 0
 
-        if docstring is None or len(docstring.strip()) == 0:
+        if not documented:
             updated_node = cst.RemoveFromParent()
 
-            self.undocumented_functions.append(
-                cst.Module([]).code_for_node(original_node)
-            )
-
+            self.undocumented_functions.append(code)
             self.undocumented_function_names.append(original_node.name.value)
         else:
-            # https://stackoverflow.com/questions/60867937/libcst-converting-arbitrary-nodes-to-code/63421188#63421188
-            self.function_chunks.append(cst.Module([]).code_for_node(original_node))
+            self.function_chunks.append(code)
+
+        self.functions.append(
+            FunctionRecord(
+                name=original_node.name.value,
+                qualified_name=qualified_name,
+                code=code,
+                start_line=start_line,
+                end_line=end_line,
+                documented=documented,
+            )
+        )
 
         return super().leave_FunctionDef(original_node, updated_node)
 
@@ -128,17 +168,79 @@ class RemoveFunctionsWithoutDocStrings(cst.CSTTransformer):
         return super().leave_Arg(original_node, updated_node)
 
 
-def get_undocumented_functions(logger, code_content: str, file_name: str):
-    logger.debug("Obtendo as funções não documentadas no arquivo %s.", file_name)
+@dataclass
+class FunctionRecord:
+    name: str
+    qualified_name: str
+    code: str
+    start_line: int
+    end_line: int
+    documented: bool
+
+
+@dataclass
+class FileRecord:
+    """Resultado da análise única de um arquivo-fonte.
+
+    Reúne as funções documentadas (usadas como chunks), as não documentadas
+    (candidatas à geração de docstrings) e a árvore sintática, reaproveitada
+    na inserção das docstrings.
+    """
+
+    file_name: str
+    functions: List[FunctionRecord] = field(default_factory=list)
+    module: cst.Module | None = None
+
+    @property
+    def documented_functions(self) -> List[FunctionRecord]:
+        return [function for function in self.functions if function.documented]
+
+    @property
+    def documented_chunks(self) -> List[str]:
+        return [function.code for function in self.documented_functions]
+
+    @property
+    def undocumented(self) -> List[FunctionRecord]:
+        return [function for function in self.functions if not function.documented]
+
+    @property
+    def undocumented_functions(self) -> List[str]:
+        return [function.code for function in self.undocumented]
+
+    @property
+    def undocumented_function_names(self) -> List[str]:
+        return [function.name for function in self.undocumented]
+
+    @property
+    def undocumented_qualified_names(self) -> List[str]:
+        return [function.qualified_name for function in self.undocumented]
+
+
+def extract_file_record(logger, code_content: str, file_name: str) -> FileRecord:
+    logger.debug("Analisando a árvore sintática do arquivo %s.", file_name)
 
     source_tree = cst.parse_module(source=code_content)
+    wrapper = MetadataWrapper(source_tree, unsafe_skip_copy=True)
 
     visitor = FunctionWithDocsStrings()
-    transformer = RemoveFunctionsWithoutDocStrings(visitor)
-    modified_tree = source_tree.visit(transformer)
+    transformer = RemoveFunctionsWithoutDocStrings(visitor, module=source_tree)
+    wrapper.visit(transformer)
+
+    return FileRecord(
+        file_name=file_name, functions=transformer.functions, module=source_tree
+    )
+
+
+def get_undocumented_functions(
+    logger, code_content: str, file_name: str, record: FileRecord | None = None
+):
+    logger.debug("Obtendo as funções não documentadas no arquivo %s.", file_name)
 
-    undocumented_functions = transformer.undocumented_functions
-    undocumented_function_names = transformer.undocumented_function_names
+    if record is None:
+        record = extract_file_record(logger, code_content, file_name)
+
+    undocumented_functions = record.undocumented_functions
+    undocumented_function_names = record.undocumented_function_names
 
     logger.debug(
         "Existem %d funções não documentadas no arquivo %s",
@@ -158,8 +260,23 @@ class InsertDocStringTransformer(cst.CSTTransformer):
     def __init__(self, visitor, functions_and_docstrings):
         self.visitor = visitor
         self.functions_and_docstrings = functions_and_docstrings
+        self.stack: list[str] = []
         # self.switch_value = False
 
+    def visit_ClassDef(self, node: cst.ClassDef) -> bool | None:
+        self.stack.append(node.name.value)
+
+    def leave_ClassDef(
+        self, original_node: cst.ClassDef, updated_node: cst.ClassDef
+    ) -> (
+        cst.BaseStatement | cst.FlattenSentinel[cst.BaseStatement] | cst.RemovalSentinel
+    ):
+        self.stack.pop()
+        return updated_node
+
+    def visit_FunctionDef(self, node: cst.FunctionDef) -> bool | None:
+        self.stack.append(node.name.value)
+
     def leave_FunctionDef(
         self, original_node: cst.FunctionDef, updated_node: cst.FunctionDef
     ) -> (
@@ -167,9 +284,16 @@ class InsertDocStringTransformer(cst.CSTTransformer):
     ):
         docstring = original_node.get_docstring()
         function_name = original_node.name.value
+        qualified_name = ".".join(self.stack)
+        self.stack.pop()
 
-        if function_name in self.functions_and_docstrings:
+        # Nomes qualificados (Classe.metodo) têm precedência sobre nomes simples
+        if qualified_name in self.functions_and_docstrings:
+            new_docstring_text = self.functions_and_docstrings[qualified_name]
+        elif function_name in self.functions_and_docstrings:
             new_docstring_text = self.functions_and_docstrings[function_name]
+        else:
+            return updated_node
 
         if docstring is None:
             # https://stackoverflow.com/questions/67925466/libcst-inserting-new-node-adds-inline-code-and-a-semicolon/77019008#77019008
@@ -198,3 +322,28 @@ class InsertDocStringTransformer(cst.CSTTransformer):
             updated_node = original_node.with_changes(body=new_body)
 
         return updated_node
+
+
+def insert_docstrings(
+    logger, record: FileRecord, functions_and_docstrings: dict[str, str]
+) -> str:
+    logger.debug(
+        "Inserindo %d docstrings no arquivo %s.",
+        len(functions_and_docstrings),
+        record.file_name,
+    )
+
+    source_tree = record.module
+    if source_tree is None:
+        # Registros vindos de outros processos não carregam a árvore sintática
+        with open(record.file_name, mode="r", encoding="utf-8") as code_file:
+            source_tree = cst.parse_module(source=code_file.read())
+
+    visitor = InsertDocStringVisitor()
+    transformer = InsertDocStringTransformer(
+        visitor=visitor,
+        functions_and_docstrings=functions_and_docstrings,
+    )
+    modified_tree = source_tree.visit(transformer)
+
+    return modified_tree.code
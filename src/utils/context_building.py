@@ -0,0 +1,130 @@
+import os
+from dataclasses import dataclass
+from typing import List, Sequence, Tuple
+from utils.environment import load_environment
+from utils.completion_cache import get_chunk_id
+from utils.token_counting import count_tokens
+
+# Menor sobreposição (em caracteres) considerada ao juntar chunks vizinhos;
+# abaixo disso coincidências casuais seriam removidas do contexto
+MIN_OVERLAP_CHARS = 32
+
+# Separador entre os chunks no contexto enviado à LLM
+CONTEXT_SEPARATOR = "\n\n"
+
+
+@dataclass
+class ContextSettings:
+    """Limites aplicados ao contexto enviado à LLM.
+
+    ``max_tokens`` é o orçamento de tokens do contexto e ``max_distance`` a
+    maior distância (L2 ao quadrado, como devolvida pelo FAISS) aceita para um
+    chunk recuperado; ``None`` desativa o corte por distância.
+    """
+
+    max_tokens: int = 3000
+    max_distance: float | None = None
+
+    @classmethod
+    def from_environment(cls) -> "ContextSettings":
+        load_environment()
+        max_distance = os.getenv("CONTEXTO_DISTANCIA_MAXIMA")
+        return cls(
+            max_tokens=int(os.getenv("CONTEXTO_MAX_TOKENS", "3000")),
+            max_distance=float(max_distance) if max_distance else None,
+        )
+
+
+def filter_indices_by_distance(
+    indices: Sequence[int],
+    distances: Sequence[float],
+    max_distance: float | None = None,
+) -> List[int]:
+    # Índices aproximados devolvem -1 quando há menos de k vizinhos nas listas visitadas
+    return [
+        int(i)
+        for i, distance in zip(indices, distances)
+        if i >= 0 and (max_distance is None or distance <= max_distance)
+    ]
+
+
+def find_overlap(previous: str, following: str) -> int:
+    """Tamanho do maior sufixo de ``previous`` que é prefixo de ``following``."""
+    if len(previous) < MIN_OVERLAP_CHARS or len(following) < MIN_OVERLAP_CHARS:
+        return 0
+
+    probe = following[:MIN_OVERLAP_CHARS]
+    start = max(0, len(previous) - len(following))
+    position = previous.find(probe, start)
+    while position != -1:
+        if following.startswith(previous[position:]):
+            return len(previous) - position
+        position = previous.find(probe, position + 1)
+    return 0
+
+
+def remove_overlaps(chunks: List[str]) -> List[str]:
+    """Remove chunks repetidos e o trecho que cada chunk repete de outro.
+
+    Chunks vizinhos no documento compartilham tokens (ver CHUNK_OVERLAP_TOKENS);
+    a parte repetida é cortada do chunk de pior posição no ranking.
+    """
+    seen_ids = set()
+    selected: List[str] = []
+
+    for chunk in chunks:
+        chunk_id = get_chunk_id(chunk)
+        if chunk_id in seen_ids or any(chunk in kept for kept in selected):
+            continue
+        seen_ids.add(chunk_id)
+
+        for kept in selected:
+            overlap = find_overlap(kept, chunk)
+            if overlap > 0:
+                chunk = chunk[overlap:]
+            overlap = find_overlap(chunk, kept)
+            if overlap > 0:
+                chunk = chunk[:-overlap]
+
+        if len(chunk.strip()) > 0:
+            selected.append(chunk)
+
+    return selected
+
+
+def build_context(
+    logger,
+    relevant_chunks: List[str],
+    settings: ContextSettings | None = None,
+    model: str = "gpt-4o-mini",
+) -> Tuple[List[str], str]:
+    """Monta o contexto com os chunks na ordem do ranking até esgotar o orçamento.
+
+    Devolve os trechos efetivamente usados e o texto do contexto.
+    """
+    if settings is None:
+        settings = ContextSettings.from_environment()
+
+    candidates = remove_overlaps(relevant_chunks)
+    separator_tokens = count_tokens(CONTEXT_SEPARATOR, model)
+
+    selected: List[str] = []
+    used_tokens = 0
+    for chunk in candidates:
+        chunk_tokens = count_tokens(chunk, model)
+        if len(selected) > 0:
+            chunk_tokens += separator_tokens
+        if used_tokens + chunk_tokens > settings.max_tokens:
+            # Chunks menores mais abaixo no ranking ainda podem caber
+            continue
+        selected.append(chunk)
+        used_tokens += chunk_tokens
+
+    logger.debug(
+        "Contexto com %d de %d chunks recuperados (%d tokens, orçamento de %d).",
+        len(selected),
+        len(relevant_chunks),
+        used_tokens,
+        settings.max_tokens,
+    )
+    return selected, CONTEXT_SEPARATOR.join(selected)
@@ -1,10 +1,113 @@
+import atexit
 import logging
-from logging.handlers import RotatingFileHandler
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+import numpy as np
+from utils.environment import load_environment
+
+# Vetores com mais elementos que isso são registrados apenas como um resumo
+VECTOR_SUMMARY_MIN_ITEMS = 16
+# Quantidade de elementos exibidos de vetores e listas longas
+PREVIEW_ITEMS = 4
+
+
+def summarize_vector(values) -> str:
+    vector = np.asarray(values, dtype=np.float64).ravel()
+    preview = ", ".join(f"{value:.4f}" for value in vector[:PREVIEW_ITEMS])
+    return (
+        f"<vetor de {vector.size} valores: [{preview}, ...] "
+        f"norma={np.linalg.norm(vector):.4f}>"
+    )
+
+
+def truncate_text(text: str, max_chars: int) -> str:
+    if len(text) <= max_chars:
+        return text
+    return f"{text[:max_chars]}... (+{len(text) - max_chars} caracteres)"
+
+
+def is_numeric_sequence(value) -> bool:
+    return (
+        isinstance(value, (list, tuple))
+        and len(value) >= VECTOR_SUMMARY_MIN_ITEMS
+        and all(isinstance(item, (int, float)) for item in value[:PREVIEW_ITEMS])
+    )
+
+
+def summarize_argument(value, max_chars: int):
+    """Versão compacta de um argumento de log: vetores resumidos, textos truncados."""
+    if isinstance(value, np.ndarray):
+        if value.size >= VECTOR_SUMMARY_MIN_ITEMS:
+            return summarize_vector(value)
+        return value
+    if is_numeric_sequence(value):
+        return summarize_vector(value)
+    if isinstance(value, str):
+        return truncate_text(value, max_chars)
+    if isinstance(value, (list, tuple)):
+        items = [summarize_argument(item, max_chars) for item in value[:PREVIEW_ITEMS]]
+        if len(value) > PREVIEW_ITEMS:
+            items.append(f"... (+{len(value) - PREVIEW_ITEMS} itens)")
+        return items
+    return value
+
+
+class PayloadSummaryFormatter(logging.Formatter):
+    """Formata as mensagens resumindo vetores e truncando textos muito grandes.
+
+    Roda na thread de escrita do log, fora do caminho das consultas.
+    """
+
+    def __init__(self, fmt: str, max_chars: int):
+        super().__init__(fmt)
+        self.max_chars = max_chars
+
+    def format(self, record: logging.LogRecord) -> str:
+        if record.args and not getattr(record, "payload_summarized", False):
+            if isinstance(record.args, dict):
+                record.args = {
+                    key: summarize_argument(value, self.max_chars)
+                    for key, value in record.args.items()
+                }
+            else:
+                record.args = tuple(
+                    summarize_argument(value, self.max_chars) for value in record.args
+                )
+            # O mesmo registro passa pelo console e pelo arquivo
+            record.payload_summarized = True
+        return super().format(record)
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        record.message = truncate_text(record.message, self.max_chars)
+        return super().formatMessage(record)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """Enfileira o registro sem formatá-lo.
+
+    O QueueHandler padrão monta a mensagem na thread que chamou o log; aqui a
+    formatação fica para a thread de escrita. Os argumentos não podem ser
+    alterados depois da chamada de log (vetores e chunks não são).
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
 
 
 def logger_setup(logger, log_file_name):
+    load_environment()
+    max_chars = int(os.getenv("LOG_MAX_CARACTERES", "2000"))
+    rotate_on_start = os.getenv("LOG_ROTACIONAR_A_CADA_EXECUCAO", "false").lower() in (
+        "1",
+        "true",
+        "sim",
+    )
+
     # create formatter
-    formatter = logging.Formatter("%(asctime)s [%(levelname)s] %(message)s")
+    formatter = PayloadSummaryFormatter(
+        "%(asctime)s [%(levelname)s] %(message)s", max_chars
+    )
 
     # create console handler
     ch = logging.StreamHandler()
@@ -13,18 +116,22 @@ def logger_setup(logger, log_file_name):
     # add formatter to ch
     ch.setFormatter(formatter)
 
-    # add ch to logger
-    logger.addHandler(ch)
-
     # create file handler which logs even debug messages
     fh = RotatingFileHandler(
         log_file_name, maxBytes=20000000, backupCount=100, encoding="utf-8"
     )
-    fh.doRollover()
+    if rotate_on_start and os.path.getsize(log_file_name) > 0:
+        fh.doRollover()
     fh.setLevel(logging.DEBUG)
 
     # add formatter to fh
     fh.setFormatter(formatter)
 
-    # add fh to logger
-    logger.addHandler(fh)
+    # Os handlers reais rodam em uma thread própria, alimentada por uma fila
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, ch, fh, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    logger.addHandler(DeferredQueueHandler(log_queue))
+    return listener
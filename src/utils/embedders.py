@@ -0,0 +1,120 @@
+import hashlib
+import re
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import List, Tuple
+import numpy as np
+
+# Constantes do hash polinomial dos n-gramas de bytes (aritmética módulo 2**64)
+NGRAM_HASH_BASE = np.uint64(1_099_511_628_211)
+NGRAM_HASH_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+IDENTIFIER_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+CAMEL_CASE_PATTERN = re.compile(r"[A-Z]?[a-z0-9]+|[A-Z]+(?![a-z])")
+
+
+class Embedder(ABC):
+    """Interface dos geradores de embeddings usados na indexação e nas consultas.
+
+    ``name`` e ``dimension`` identificam os vetores no cache de embeddings:
+    vetores de geradores diferentes nunca se misturam.
+    """
+
+    name: str = ""
+    dimension: int | None = None
+
+    @abstractmethod
+    def embed(self, logger, texts: List[str]) -> List[List[float]]:
+        """Gera um embedding por texto, na mesma ordem; falhas viram listas vazias."""
+
+
+@lru_cache(maxsize=65536)
+def hash_identifier(identifier: str) -> int:
+    # O hash() do Python muda a cada processo; o índice precisa de um hash estável
+    digest = hashlib.blake2b(identifier.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def split_identifier(identifier: str) -> List[str]:
+    parts = [
+        part.lower()
+        for word in identifier.split("_")
+        for part in CAMEL_CASE_PATTERN.findall(word)
+    ]
+    lowered = identifier.lower()
+    if len(parts) > 1 or (len(parts) == 1 and parts[0] != lowered):
+        return [lowered] + parts
+    return [lowered]
+
+
+class HashingEmbedder(Embedder):
+    """Embeddings locais, sem rede, por hashing de n-gramas e identificadores.
+
+    Cada texto vira a contagem (com sinal) dos seus n-gramas de bytes e dos
+    identificadores e suas partes (``snake_case``/``camelCase``), projetada em
+    ``dimension`` posições por hash. As contagens são suavizadas com log e o
+    vetor é normalizado, de modo que a distância L2 ordena como o cosseno.
+    """
+
+    def __init__(
+        self,
+        dimension: int = 768,
+        ngram_sizes: Tuple[int, ...] = (3, 4),
+        identifier_weight: float = 2.0,
+    ):
+        self.dimension = dimension
+        self.ngram_sizes = ngram_sizes
+        self.identifier_weight = identifier_weight
+        self.name = "local-hashing-" + "-".join(str(n) for n in ngram_sizes)
+
+    def _hash_ngrams(self, data: np.ndarray, n: int) -> np.ndarray:
+        hashes = np.zeros(len(data) - n + 1, dtype=np.uint64)
+        for offset in range(n):
+            hashes = (
+                hashes * NGRAM_HASH_BASE + data[offset : len(data) - n + 1 + offset]
+            )
+        # Mistura os bits altos nos baixos antes de reduzir à dimensão
+        hashes = (hashes ^ (hashes >> np.uint64(29))) * NGRAM_HASH_MIX
+        return hashes ^ (hashes >> np.uint64(32))
+
+    def _accumulate(self, vector: np.ndarray, hashes: np.ndarray, weight: float):
+        columns = (hashes % np.uint64(self.dimension)).astype(np.int64)
+        signs = np.where(hashes >> np.uint64(63), -weight, weight)
+        vector += np.bincount(columns, weights=signs, minlength=self.dimension)
+
+    def embed_text(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimension, dtype=np.float64)
+
+        normalized = " ".join(text.lower().split())
+        data = np.frombuffer(normalized.encode("utf-8"), dtype=np.uint8).astype(
+            np.uint64
+        )
+        for n in self.ngram_sizes:
+            if len(data) >= n:
+                self._accumulate(vector, self._hash_ngrams(data, n), 1.0)
+
+        identifiers = [
+            hash_identifier(part)
+            for identifier in IDENTIFIER_PATTERN.findall(text)
+            for part in split_identifier(identifier)
+        ]
+        if len(identifiers) > 0:
+            self._accumulate(
+                vector,
+                np.array(identifiers, dtype=np.uint64),
+                self.identifier_weight,
+            )
+
+        return vector
+
+    def embed(self, logger, texts: List[str]) -> List[List[float]]:
+        matrix = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            matrix[row] = self.embed_text(text)
+
+        matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms > 0, norms, 1)
+
+        logger.debug("Embeddings locais calculados para %d textos.", len(texts))
+        return matrix.tolist()
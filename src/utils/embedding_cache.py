@@ -0,0 +1,268 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+import numpy as np
+
+# Dimensão padrão dos modelos de embedding da OpenAI
+EMBEDDING_DIMENSIONS = {
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+    "text-embedding-ada-002": 1536,
+}
+
+
+def get_cache_key(model: str, dimension: int, text: str) -> str:
+    # O texto exato entra no hash: em Python, chunks que diferem apenas na
+    # indentação podem ter significados diferentes
+    text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return f"{model}:{dimension}:{text_hash}"
+
+
+class EmbeddingCache:
+    """Cache persistente de embeddings endereçado pelo conteúdo dos chunks.
+
+    As entradas são indexadas por (modelo, dimensão, hash do texto)
+    e as menos usadas recentemente são removidas quando o limite é atingido.
+    """
+
+    def __init__(
+        self,
+        logger,
+        cache_file: str = "embeddings_cache.sqlite",
+        max_entries: int = 500_000,
+    ):
+        self.logger = logger
+        self.cache_file = cache_file
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # A mesma conexão pode ser usada por várias threads (geração em lote)
+        self.lock = threading.RLock()
+
+        self.connection = sqlite3.connect(cache_file, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_access REAL NOT NULL)"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_access "
+            "ON embeddings (last_access)"
+        )
+        self.connection.commit()
+
+    def __len__(self) -> int:
+        with self.lock:
+            (count,) = self.connection.execute(
+                "SELECT COUNT(*) FROM embeddings"
+            ).fetchone()
+        return count
+
+    def get_many(
+        self, model: str, texts: List[str], dimension: Optional[int] = None
+    ) -> List[Optional[List[float]]]:
+        with self.lock:
+            return self._get_many(model, texts, dimension)
+
+    def _get_many(
+        self, model: str, texts: List[str], dimension: Optional[int] = None
+    ) -> List[Optional[List[float]]]:
+        dimension = dimension or EMBEDDING_DIMENSIONS.get(model, 0)
+        keys = [get_cache_key(model, dimension, text) for text in texts]
+
+        found: dict[str, bytes] = {}
+        # O SQLite limita a quantidade de parâmetros por consulta
+        for start in range(0, len(keys), 500):
+            batch_keys = keys[start : start + 500]
+            placeholders = ",".join("?" * len(batch_keys))
+            rows = self.connection.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                batch_keys,
+            ).fetchall()
+            found.update(rows)
+
+        if found:
+            now = time.time()
+            self.connection.executemany(
+                "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                [(now, key) for key in found],
+            )
+            self.connection.commit()
+
+        embeddings: List[Optional[List[float]]] = []
+        for key in keys:
+            if key in found:
+                self.hits += 1
+                embeddings.append(np.frombuffer(found[key], dtype=np.float32).tolist())
+            else:
+                self.misses += 1
+                embeddings.append(None)
+
+        return embeddings
+
+    def put_many(
+        self,
+        model: str,
+        texts: List[str],
+        embeddings: List[List[float]],
+        dimension: Optional[int] = None,
+    ):
+        with self.lock:
+            self._put_many(model, texts, embeddings, dimension)
+
+    def _put_many(
+        self,
+        model: str,
+        texts: List[str],
+        embeddings: List[List[float]],
+        dimension: Optional[int] = None,
+    ):
+        dimension = dimension or EMBEDDING_DIMENSIONS.get(model, 0)
+        now = time.time()
+        rows = [
+            (
+                get_cache_key(model, dimension, text),
+                np.asarray(embedding, dtype=np.float32).tobytes(),
+                now,
+            )
+            for text, embedding in zip(texts, embeddings)
+            if len(embedding) > 0
+        ]
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO embeddings (key, vector, last_access) "
+            "VALUES (?, ?, ?)",
+            rows,
+        )
+        self.connection.commit()
+        self.evict()
+
+    def evict(self):
+        excess = len(self) - self.max_entries
+        if excess <= 0:
+            return
+
+        self.connection.execute(
+            "DELETE FROM embeddings WHERE key IN ("
+            "SELECT key FROM embeddings ORDER BY last_access LIMIT ?)",
+            (excess,),
+        )
+        self.connection.commit()
+        self.evictions += excess
+        self.logger.debug("Removidas %d entradas do cache de embeddings.", excess)
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0.0
+
+    def log_statistics(self):
+        self.logger.info(
+            "Cache de embeddings: %d acertos, %d falhas (taxa de acerto %.1f%%), "
+            "%d remoções, %d entradas em disco.",
+            self.hits,
+            self.misses,
+            100 * self.hit_rate(),
+            self.evictions,
+            len(self),
+        )
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+class QueryEmbeddingCache:
+    """Cache LRU em memória para os embeddings das perguntas.
+
+    Opcionalmente consulta um ``EmbeddingCache`` em disco quando a pergunta não
+    está na memória. Expõe a mesma interface ``get_many``/``put_many`` do cache
+    em disco, podendo ser passado diretamente para ``create_embeddings``.
+    """
+
+    def __init__(self, capacity: int = 1024, disk_cache: EmbeddingCache | None = None):
+        self.capacity = capacity
+        self.disk_cache = disk_cache
+        self.entries: OrderedDict[str, List[float]] = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get_many(
+        self, model: str, texts: List[str], dimension: Optional[int] = None
+    ) -> List[Optional[List[float]]]:
+        dimension = dimension or EMBEDDING_DIMENSIONS.get(model, 0)
+        keys = [get_cache_key(model, dimension, text) for text in texts]
+
+        embeddings: List[Optional[List[float]]] = []
+        with self.lock:
+            for key in keys:
+                embedding = self.entries.get(key)
+                if embedding is not None:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                embeddings.append(embedding)
+
+        missing_positions = [
+            position
+            for position, embedding in enumerate(embeddings)
+            if embedding is None
+        ]
+        if self.disk_cache is not None and len(missing_positions) > 0:
+            disk_embeddings = self.disk_cache.get_many(
+                model, [texts[position] for position in missing_positions], dimension
+            )
+            for position, embedding in zip(missing_positions, disk_embeddings):
+                if embedding is not None:
+                    embeddings[position] = embedding
+                    self._store(keys[position], embedding)
+
+        with self.lock:
+            self.disk_hits += sum(
+                1 for position in missing_positions if embeddings[position] is not None
+            )
+            self.misses += sum(1 for embedding in embeddings if embedding is None)
+
+        return embeddings
+
+    def put_many(
+        self,
+        model: str,
+        texts: List[str],
+        embeddings: List[List[float]],
+        dimension: Optional[int] = None,
+    ):
+        dimension = dimension or EMBEDDING_DIMENSIONS.get(model, 0)
+        for text, embedding in zip(texts, embeddings):
+            if len(embedding) > 0:
+                self._store(get_cache_key(model, dimension, text), embedding)
+
+        if self.disk_cache is not None:
+            self.disk_cache.put_many(model, texts, embeddings, dimension)
+
+    def _store(self, key: str, embedding: List[float]):
+        with self.lock:
+            self.entries[key] = embedding
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.disk_hits + self.misses
+        return (self.hits + self.disk_hits) / total if total > 0 else 0.0
+
+    def log_statistics(self, logger):
+        logger.info(
+            "Cache de embeddings de perguntas: %d acertos em memória, %d em disco, "
+            "%d falhas (taxa de acerto %.1f%%), %d entradas em memória.",
+            self.hits,
+            self.disk_hits,
+            self.misses,
+            100 * self.hit_rate(),
+            len(self),
+        )
@@ -1,45 +1,334 @@
 import os
 import pickle
-from typing import List
+from typing import Any, Iterable, Iterator, List, Tuple
 import faiss
-from dotenv import load_dotenv
-from utils.pdf_processing import extract_text_from_pdf
-from utils.indexing import create_faiss_index
-from utils.chunk_processing import split_text_into_chunks, split_code_into_chunks
-from utils.repository_processing import extract_source_code_from_repository
+import numpy as np
+from utils.environment import load_environment
+from utils.embedders import Embedder, HashingEmbedder
+from utils.embedding_cache import EMBEDDING_DIMENSIONS, EmbeddingCache
+from utils.indexing import (
+    ShardedIndex,
+    StreamingIndexBuilder,
+    add_to_id_index,
+    create_faiss_id_index,
+    create_faiss_index,
+    remove_from_id_index,
+)
+from utils.lexical_index import (
+    LexicalIndex,
+    ShardedLexicalIndex,
+    load_lexical_index,
+    save_lexical_index,
+    tokenize_code,
+)
+from utils.manifest import (
+    diff_repository_against_manifest,
+    load_manifest,
+    save_manifest,
+)
+from utils.chunk_processing import iter_page_chunks
+from utils.ingestion_pipeline import IngestionSettings, iter_in_background
+from utils.storage import (
+    MmapArtifactsWriter,
+    ShardedChunks,
+    check_index_can_be_stored,
+    load_embeddings_mmap,
+    save_chunk_pages,
+    save_embeddings_mmap,
+)
+from utils.parallel_processing import (
+    FileProcessingResult,
+    iter_processed_files,
+    process_files_in_parallel,
+)
+from utils.repository_processing import (
+    CodeRepository,
+    get_code_repositories,
+    get_all_python_files_from_repository,
+    iter_python_files,
+)
+from utils.token_counting import count_tokens, split_text_by_tokens
+from utils.instrumentation import metrics, timed
+
+# Limites de cada requisição de embeddings em lote
+EMBEDDING_BATCH_MAX_ITEMS = 256
+EMBEDDING_BATCH_MAX_TOKENS = 200_000
+# Limite de tokens de cada texto enviado ao modelo de embeddings
+EMBEDDING_MAX_INPUT_TOKENS = 8191
+
+
+class OpenAIEmbedder(Embedder):
+    """Embeddings obtidos da API da OpenAI."""
+
+    def __init__(self, client, model: str = "text-embedding-3-small"):
+        self.client = client
+        self.name = model
+        self.dimension = None
+
+    def embed(self, logger, texts: List[str]) -> List[List[float]]:
+        return get_embeddings_for_batch(logger, texts, self.client, self.name)
+
+
+def get_embedder(logger, client, model: str = "text-embedding-3-small") -> Embedder:
+    load_environment()
+    backend = os.getenv("EMBEDDING_BACKEND", "openai").lower()
+
+    if backend == "local":
+        return HashingEmbedder(
+            dimension=int(os.getenv("EMBEDDING_LOCAL_DIMENSAO", "768"))
+        )
+    if backend != "openai":
+        logger.warning(
+            "EMBEDDING_BACKEND desconhecido: %s. Usando a API da OpenAI.", backend
+        )
+    return OpenAIEmbedder(client, model)
 
 
+@timed
 def get_embedding(
-    logger, text: str, client, model: str = "text-embedding-3-small"
+    logger,
+    text: str,
+    client,
+    model: str = "text-embedding-3-small",
+    embedder: Embedder | None = None,
 ) -> List[float]:
+    if embedder is None:
+        embedder = get_embedder(logger, client, model)
+
+    text = prepare_text_for_embedding(text, model)
+    (embedding,) = embedder.embed(logger, [text])
+    return embedding
+
+
+def prepare_text_for_embedding(text: str, model: str = "text-embedding-3-small") -> str:
     text = text.replace("\n", " ")
-    try:
-        response = client.embeddings.create(input=[text], model=model)
-        embedding = response.data[0].embedding
-        return embedding
-    except IOError as ioerror:
-        logger.error("Erro ao obter embedding para o texto: %s", ioerror)
-        return []
+    # Textos acima do limite seriam rejeitados pela API: envia-se o início
+    if count_tokens(text, model) > EMBEDDING_MAX_INPUT_TOKENS:
+        text = split_text_by_tokens(text, EMBEDDING_MAX_INPUT_TOKENS, model)[0]
+    return text
+
+
+def remove_failed_embeddings(logger, embeddings: List[List[float]], *aligned_lists):
+    """Remove as posições cujo embedding falhou (lista vazia).
+
+    As listas em ``aligned_lists`` (chunks, páginas...) são filtradas nas mesmas
+    posições, para continuarem alinhadas com os embeddings.
+    """
+    valid_positions = [
+        position for position, embedding in enumerate(embeddings) if len(embedding) > 0
+    ]
+    if len(valid_positions) < len(embeddings):
+        logger.warning(
+            "%d chunks sem embedding foram descartados do índice.",
+            len(embeddings) - len(valid_positions),
+        )
+
+    return tuple(
+        [values[position] for position in valid_positions]
+        for values in (embeddings,) + aligned_lists
+    )
 
 
+@timed
 def create_embeddings(
-    logger, texts: List[str], client, model: str = "text-embedding-3-small"
+    logger,
+    texts: List[str],
+    client,
+    model: str = "text-embedding-3-small",
+    max_batch_items: int = EMBEDDING_BATCH_MAX_ITEMS,
+    max_batch_tokens: int = EMBEDDING_BATCH_MAX_TOKENS,
+    cache: EmbeddingCache | None = None,
+    embedder: Embedder | None = None,
 ) -> List[List[float]]:
-    embeddings = []
     logger.debug("Gerando embeddings para os chunks.")
 
-    for i, text in enumerate(texts):
-        logger.debug("Tamanho do texto para gerar embedding %d", len(text))
-        embedding = get_embedding(logger, text, client, model)
+    if embedder is None:
+        embedder = get_embedder(logger, client, model)
+
+    if cache is not None:
+        cached_embeddings = cache.get_many(embedder.name, texts, embedder.dimension)
+    else:
+        cached_embeddings = [None] * len(texts)
+
+    missing_positions = [
+        position
+        for position, embedding in enumerate(cached_embeddings)
+        if embedding is None
+    ]
+    missing_texts = [texts[position] for position in missing_positions]
+    logger.debug(
+        "%d chunks encontrados no cache; %d serão enviados à API.",
+        len(texts) - len(missing_texts),
+        len(missing_texts),
+    )
+    metrics.increment("embeddings.textos", len(texts))
+    metrics.increment("embeddings.textos_do_cache", len(texts) - len(missing_texts))
+
+    new_embeddings: List[List[float]] = []
+    batches = split_texts_into_batches(
+        missing_texts,
+        model,
+        max_batch_items=max_batch_items,
+        max_batch_tokens=max_batch_tokens,
+    )
+    logger.debug(
+        "%d chunks agrupados em %d requisições de embeddings.",
+        len(missing_texts),
+        len(batches),
+    )
+
+    for batch in batches:
+        batch_texts = [prepare_text_for_embedding(text, model) for text in batch]
+        new_embeddings.extend(embedder.embed(logger, batch_texts))
+        logger.debug(
+            "Processados %d / %d chunks.", len(new_embeddings), len(missing_texts)
+        )
+
+    if cache is not None and len(missing_texts) > 0:
+        cache.put_many(embedder.name, missing_texts, new_embeddings, embedder.dimension)
+
+    embeddings: List[List[float]] = []
+    new_embeddings_iterator = iter(new_embeddings)
+    for embedding in cached_embeddings:
+        if embedding is None:
+            embedding = next(new_embeddings_iterator)
         embeddings.append(embedding)
-        if (i + 1) % 10 == 0 or (i + 1) == len(texts):
-            logger.debug("Processados %d / %d chunks.", i + 1, len(texts))
+
     return embeddings
 
 
+def iter_embeddings_in_batches(
+    logger,
+    items: Iterable[Tuple[Any, str]],
+    client,
+    model: str = "text-embedding-3-small",
+    batch_size: int = EMBEDDING_BATCH_MAX_ITEMS,
+    cache: EmbeddingCache | None = None,
+    embedder: Embedder | None = None,
+) -> Iterator[Tuple[Any, str, List[float]]]:
+    """Gera embeddings para um fluxo de (metadado, texto) em lotes.
+
+    Apenas um lote fica em memória por vez; cada item é devolvido como
+    (metadado, texto, embedding), na ordem de entrada.
+    """
+    batch: List[Tuple[Any, str]] = []
+    if embedder is None:
+        embedder = get_embedder(logger, client, model)
+
+    def embed_batch():
+        embeddings = create_embeddings(
+            logger,
+            [text for _, text in batch],
+            client,
+            model,
+            cache=cache,
+            embedder=embedder,
+        )
+        for (metadata, text), embedding in zip(batch, embeddings):
+            yield metadata, text, embedding
+
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield from embed_batch()
+            batch = []
+
+    if len(batch) > 0:
+        yield from embed_batch()
+
+
+def get_embedding_cache(logger) -> EmbeddingCache:
+    load_environment()
+    cache_file = os.getenv("EMBEDDING_CACHE_FILE", "embeddings_cache.sqlite")
+    max_entries = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "500000"))
+    logger.debug(
+        "Cache de embeddings em %s (máx. %d entradas)", cache_file, max_entries
+    )
+    return EmbeddingCache(logger, cache_file=cache_file, max_entries=max_entries)
+
+
+def split_texts_into_batches(
+    texts: List[str],
+    model: str = "text-embedding-3-small",
+    max_batch_items: int = EMBEDDING_BATCH_MAX_ITEMS,
+    max_batch_tokens: int = EMBEDDING_BATCH_MAX_TOKENS,
+) -> List[List[str]]:
+    batches: List[List[str]] = []
+    current_batch: List[str] = []
+    current_batch_tokens = 0
+
+    for text in texts:
+        text_tokens = count_tokens(text, model)
+        if current_batch and (
+            len(current_batch) >= max_batch_items
+            or current_batch_tokens + text_tokens > max_batch_tokens
+        ):
+            batches.append(current_batch)
+            current_batch = []
+            current_batch_tokens = 0
+
+        current_batch.append(text)
+        current_batch_tokens += text_tokens
+
+    if current_batch:
+        batches.append(current_batch)
+
+    return batches
+
+
+def get_embeddings_for_batch(
+    logger,
+    texts: List[str],
+    client,
+    model: str = "text-embedding-3-small",
+) -> List[List[float]]:
+    # O pacote openai é pesado: só é importado por quem de fato chama a API
+    from openai import BadRequestError  # pylint: disable=import-outside-toplevel
+
+    # Falhas transitórias (conexão, limite de requisições, erros 5xx) já são
+    # repetidas pelo cliente; as demais são relançadas para quem chamou
+    try:
+        response = client.embeddings.create(input=texts, model=model)
+    except BadRequestError as error:
+        # Requisição recusada por algum texto do lote: divide o lote ao meio
+        # para isolar o texto inválido
+        metrics.increment("embeddings.lotes_recusados")
+        if len(texts) == 1:
+            logger.error("Texto recusado pela API de embeddings: %s", error)
+            metrics.increment("embeddings.textos_sem_embedding")
+            return [[]]
+
+        logger.warning(
+            "Lote de %d textos recusado pela API de embeddings; dividindo o lote: %s",
+            len(texts),
+            error,
+        )
+        middle = len(texts) // 2
+        return get_embeddings_for_batch(
+            logger, texts[:middle], client, model
+        ) + get_embeddings_for_batch(logger, texts[middle:], client, model)
+
+    metrics.increment("embeddings.requisicoes")
+    metrics.record_usage("embeddings", getattr(response, "usage", None))
+    if len(response.data) != len(texts):
+        raise ValueError(
+            f"A API de embeddings devolveu {len(response.data)} embeddings para "
+            f"{len(texts)} textos."
+        )
+
+    # A API informa a posição de cada item; a ordem original é restaurada
+    data = sorted(response.data, key=lambda item: item.index)
+    return [item.embedding for item in data]
+
+
+@timed
 def get_embeddings_from_PDF_files(logger, client):
+    # Apenas o corpus de PDFs precisa do PyPDF2
+    from utils.pdf_processing import (  # pylint: disable=import-outside-toplevel
+        iter_pdf_pages,
+    )
 
-    embeddings, chunks, index = load_embeddings(logger)
+    embeddings, chunks, index = load_stored_embeddings(logger)
     if len(embeddings) == 0:
         logger.info(
             "Embeddings não encontrados. Processando PDF e criando embeddings..."
@@ -50,20 +339,35 @@ def get_embeddings_from_PDF_files(logger, client):
 
         logger.debug("Arquivo sendo processado: %s", pdf_path)
 
-        text = extract_text_from_pdf(logger, pdf_path)
-        logger.debug("Comprimento do texto extraído: %d", len(text))
-
-        chunks = split_text_into_chunks(logger, text)
+        # Páginas, chunks e embeddings fluem em sequência: o documento inteiro
+        # nunca é montado em uma única string
+        pages = iter_pdf_pages(logger, pdf_path)
+        page_chunks = iter_page_chunks(logger, pages)
+
+        chunks = []
+        chunk_pages = []
+        embeddings = []
+        cache = get_embedding_cache(logger)
+        for page_number, chunk, embedding in iter_embeddings_in_batches(
+            logger, page_chunks, client, cache=cache
+        ):
+            chunk_pages.append(page_number)
+            chunks.append(chunk)
+            embeddings.append(embedding)
+        cache.log_statistics()
+        cache.close()
         logger.debug("Número de chunks gerados: %d", len(chunks))
-
-        embeddings = create_embeddings(logger, chunks, client)
         logger.debug(
             "Tamanho da lista de embeddings gerada a partir dos chunks: %d",
             len(embeddings),
         )
 
-        index: faiss.IndexFlatL2 = create_faiss_index(logger, embeddings)
-        save_embeddings(logger, embeddings, chunks, index)
+        embeddings, chunks, chunk_pages = remove_failed_embeddings(
+            logger, embeddings, chunks, chunk_pages
+        )
+        index: faiss.Index = create_faiss_index(logger, embeddings)
+        store_embeddings(logger, embeddings, chunks, index)
+        save_chunk_pages(logger, chunk_pages)
         logger.info("Embeddings e índice salvos.")
     else:
         logger.info("Embeddings carregados dos arquivos.")
@@ -71,68 +375,120 @@ def get_embeddings_from_PDF_files(logger, client):
     return embeddings, chunks, index
 
 
-def get_embeddings_from_code_bases(logger, client):
-
-    embeddings_file = "embeddings_code.pkl"
-    chunks_file = "chunks_code.pkl"
-    index_file = "faiss_code.index"
+@timed
+def get_embeddings_from_code_base(
+    logger,
+    client,
+    repository: CodeRepository,
+    incremental: bool = False,
+    file_results: List[FileProcessingResult] | None = None,
+    update_index: bool = False,
+):
+    artifact_suffix = repository.artifact_suffix
+    code_repository_path = repository.path
+    index_file = get_index_file(artifact_suffix, get_code_artifact_format(incremental))
+
+    if incremental:
+        chunks_file = f"chunks{artifact_suffix}_incremental.pkl"
+        chunks: dict[int, str] = {}
+        index = None
+        if not update_index:
+            # Consultas usam o índice como está; só a indexação percorre o
+            # repositório em busca de alterações
+            chunks, index = load_incremental_embeddings(logger, chunks_file, index_file)
+        if index is None:
+            chunks, index = update_code_embeddings_incrementally(
+                logger,
+                client,
+                repo_path=code_repository_path,
+                chunks_file=chunks_file,
+                index_file=index_file,
+                manifest_file=f"manifest{artifact_suffix}.json",
+            )
+        if index is None:
+            return [], [], None
+        # No modo incremental os vetores ficam armazenados apenas no índice FAISS
+        return [], chunks, index
 
-    embeddings, chunks, index = load_embeddings(
-        logger=logger,
-        embeddings_file=embeddings_file,
-        chunks_file=chunks_file,
-        index_file=index_file,
+    embeddings, chunks, index = load_stored_embeddings(
+        logger, artifact_suffix=artifact_suffix
     )
-    if len(embeddings) == 0:
+    ingestion_settings = IngestionSettings.from_environment()
+    if (
+        len(embeddings) == 0
+        and ingestion_settings.enabled
+        and get_storage_format() == "mmap"
+    ):
+        indexed_chunks = stream_code_embeddings_into_index(
+            logger,
+            client,
+            repo_path=code_repository_path,
+            settings=ingestion_settings,
+            file_results=file_results,
+            artifact_suffix=artifact_suffix,
+        )
+        if indexed_chunks == 0:
+            # Nada foi gravado; o índice vazio da carga não tem dimensão
+            return [], [], None
+        embeddings, chunks, index = load_stored_embeddings(
+            logger, artifact_suffix=artifact_suffix
+        )
+    elif len(embeddings) == 0:
         logger.info(
             "Embeddings não encontrados. Processando repositórios de código e criando os embeddings..."
         )
 
-        load_dotenv()
-        code_repository_path = os.getenv("REPOSITORY_1_PATH")
-
         logger.debug("Repositório sendo processado %s", code_repository_path)
 
-        code_file_contents, file_names = extract_source_code_from_repository(
-            logger, code_repository_path
-        )
+        if file_results is None:
+            file_names = get_all_python_files_from_repository(
+                logger, code_repository_path
+            )
+            file_results = process_files_in_parallel(
+                logger, file_names, repo_path=code_repository_path
+            )
 
         logger.debug(
-            "Número de arquivos-fonte a serem processados: %d", len(code_file_contents)
+            "Número de arquivos-fonte a serem processados: %d", len(file_results)
         )
 
-        for code_file_position, code_file_content in enumerate(code_file_contents):
-            file_name = file_names[code_file_position]
-
-            file_name = file_name.replace(code_repository_path, "")  # type: ignore
-            file_name = file_name.strip("\\")
-            file_name = file_name.strip("/")
-
-            current_file_chunks = split_code_into_chunks(
-                logger=logger,
-                code_content=code_file_content,
-                file_name=file_name,
-            )
-            chunks = chunks + current_file_chunks
+        chunks = []
+        chunk_terms = []
+        for file_result in file_results:
+            chunks.extend(file_result.chunks)
+            chunk_terms.extend(file_result.chunk_terms)
 
         logger.debug("Número de chunks gerados: %d", len(chunks))
 
-        embeddings = create_embeddings(logger, chunks, client)
+        cache = get_embedding_cache(logger)
+        embeddings = create_embeddings(logger, chunks, client, cache=cache)
+        cache.log_statistics()
+        cache.close()
         logger.debug(
             "Tamanho da lista de embeddings gerada a partir dos chunks: %d",
             len(embeddings),
         )
 
-        index: faiss.IndexFlatL2 = create_faiss_index(logger, embeddings)
+        embeddings, chunks, chunk_terms = remove_failed_embeddings(
+            logger, embeddings, chunks, chunk_terms
+        )
+        if len(embeddings) == 0:
+            # Sem vetores não há dimensão para o índice; nada é gravado e o
+            # repositório é processado de novo na próxima execução
+            logger.warning(
+                "Nenhum chunk com embedding no repositório %s.", code_repository_path
+            )
+            return [], [], None
 
-        save_embeddings(
+        index: faiss.Index = create_faiss_index(logger, embeddings)
+        save_lexical_index(logger, LexicalIndex.build(chunk_terms), index_file)
+
+        store_embeddings(
             logger=logger,
             embeddings=embeddings,
             chunks=chunks,
             index=index,
-            embeddings_file=embeddings_file,
-            chunks_file=chunks_file,
-            index_file=index_file,
+            artifact_suffix=artifact_suffix,
         )
         logger.info("Embeddings e índice salvos.")
     else:
@@ -141,6 +497,410 @@ def get_embeddings_from_code_bases(logger, client):
     return embeddings, chunks, index
 
 
+@timed
+def get_embeddings_from_code_bases(
+    logger,
+    client,
+    incremental: bool | None = None,
+    file_results: dict[int, List[FileProcessingResult]] | None = None,
+    repositories: List[CodeRepository] | None = None,
+    update_index: bool = False,
+):
+    """Carrega ou cria o shard de cada repositório de código configurado.
+
+    Com um único repositório, devolve o índice e os chunks dele. Com vários,
+    devolve um ``ShardedIndex`` e os ``ShardedChunks`` correspondentes; nesse
+    caso os embeddings ficam apenas nos shards e a lista devolvida é vazia.
+    ``file_results`` traz, opcionalmente, os arquivos já processados de cada
+    repositório, pelo número do repositório. Repositórios sem nenhum chunk
+    indexado ficam fora da busca.
+
+    No modo incremental, os arquivos alterados só são reprocessados com
+    ``update_index``; sem ele, os artefatos existentes são usados como estão.
+    """
+    if incremental is None:
+        incremental = is_incremental_indexing_enabled()
+    if repositories is None:
+        repositories = get_code_repositories()
+    if file_results is None:
+        file_results = {}
+
+    shards = {}
+    for repository in repositories:
+        shard = get_embeddings_from_code_base(
+            logger,
+            client,
+            repository,
+            incremental=incremental,
+            file_results=file_results.get(repository.number),
+            update_index=update_index,
+        )
+        if shard[2] is None:
+            # Um repositório sem funções documentadas não impede os demais
+            logger.warning(
+                "Repositório %s sem chunks indexados: shard ignorado.",
+                repository.path,
+            )
+            continue
+        shards[repository.number] = shard
+
+    if len(shards) == 0:
+        logger.warning("Nenhum repositório de código com chunks indexados.")
+        return [], [], create_empty_index(logger, client)
+    if len(shards) == 1:
+        return next(iter(shards.values()))
+
+    logger.info("Índice de código dividido em %d shards.", len(shards))
+    index = ShardedIndex({number: shard[2] for number, shard in shards.items()})
+    chunks = ShardedChunks({number: shard[1] for number, shard in shards.items()})
+    return [], chunks, index
+
+
+def create_empty_index(logger, client) -> faiss.Index:
+    # Índice sem vetores, com a dimensão do gerador de embeddings: as buscas
+    # não encontram nada em vez de falhar. Nunca é gravado em disco.
+    embedder = get_embedder(logger, client)
+    dimension = embedder.dimension or EMBEDDING_DIMENSIONS.get(embedder.name, 0)
+    return faiss.IndexFlatL2(dimension)
+
+
+def load_code_lexical_index(
+    logger,
+    repositories: List[CodeRepository] | None = None,
+    incremental: bool | None = None,
+) -> LexicalIndex | ShardedLexicalIndex | None:
+    if repositories is None:
+        repositories = get_code_repositories()
+    artifact_format = get_code_artifact_format(incremental)
+
+    shards = {}
+    for repository in repositories:
+        index_file = get_index_file(repository.artifact_suffix, artifact_format)
+        if not os.path.exists(index_file):
+            # Repositório sem chunks: o shard também fica fora da busca densa
+            continue
+        lexical_index = load_lexical_index(logger, index_file)
+        if lexical_index is None:
+            # Sem o índice léxico de todos os shards, a busca fica apenas densa
+            return None
+        shards[repository.number] = lexical_index
+
+    if len(shards) == 0:
+        return None
+    if len(shards) == 1:
+        return next(iter(shards.values()))
+    return ShardedLexicalIndex(shards)
+
+
+def iter_chunk_batches(
+    file_results: Iterable[FileProcessingResult], batch_size: int
+) -> Iterator[Tuple[List[str], List[List[str]]]]:
+    """Reagrupa os chunks dos arquivos em lotes de ``batch_size`` (chunks, termos)."""
+    chunks: List[str] = []
+    chunk_terms: List[List[str]] = []
+    for file_result in file_results:
+        chunks.extend(file_result.chunks)
+        chunk_terms.extend(file_result.chunk_terms)
+        while len(chunks) >= batch_size:
+            yield chunks[:batch_size], chunk_terms[:batch_size]
+            chunks = chunks[batch_size:]
+            chunk_terms = chunk_terms[batch_size:]
+
+    if len(chunks) > 0:
+        yield chunks, chunk_terms
+
+
+@timed
+def stream_code_embeddings_into_index(
+    logger,
+    client,
+    repo_path: str,
+    settings: IngestionSettings | None = None,
+    file_results: Iterable[FileProcessingResult] | None = None,
+    artifact_suffix: str = "_code",
+) -> int:
+    """Indexa o repositório em streaming, com memória limitada.
+
+    Listagem, leitura e análise sintática, embeddings e gravação do índice
+    rodam ao mesmo tempo, ligadas por filas limitadas: apenas alguns lotes
+    ficam em memória por vez. Os artefatos são gravados no formato mmap e o
+    número de chunks indexados é devolvido.
+    """
+    if settings is None:
+        settings = IngestionSettings.from_environment()
+
+    logger.info(
+        "Indexando o repositório %s em streaming (lotes de %d chunks, filas de %d itens).",
+        repo_path,
+        settings.batch_size,
+        settings.queue_size,
+    )
+
+    if file_results is None:
+        file_results = iter_in_background(
+            logger,
+            iter_processed_files(
+                logger, iter_python_files(logger, repo_path), repo_path=repo_path
+            ),
+            "analise",
+            settings.queue_size * 4,
+        )
+
+    cache = get_embedding_cache(logger)
+    embedder = get_embedder(logger, client)
+
+    def iter_embedded_batches():
+        for chunks, chunk_terms in iter_chunk_batches(
+            file_results, settings.batch_size
+        ):
+            embeddings = create_embeddings(
+                logger, chunks, client, cache=cache, embedder=embedder
+            )
+            yield chunks, chunk_terms, embeddings
+
+    embedded_batches = iter_in_background(
+        logger, iter_embedded_batches(), "embeddings", settings.queue_size
+    )
+
+    index_builder = StreamingIndexBuilder(logger)
+    writer = MmapArtifactsWriter(
+        embeddings_file=f"embeddings{artifact_suffix}.npy",
+        chunks_file=f"chunks{artifact_suffix}.bin",
+        offsets_file=f"chunks{artifact_suffix}_offsets.npy",
+        index_file=get_index_file(artifact_suffix, "mmap"),
+    )
+
+    def iter_indexed_chunk_terms():
+        for chunks, chunk_terms, embeddings in embedded_batches:
+            embeddings, chunks, chunk_terms = remove_failed_embeddings(
+                logger, embeddings, chunks, chunk_terms
+            )
+            if len(embeddings) == 0:
+                continue
+
+            vectors = np.asarray(embeddings, dtype=np.float32)
+            index_builder.add(vectors)
+            writer.append(vectors, chunks)
+            logger.debug("Indexados %d chunks.", len(writer))
+            yield from chunk_terms
+
+    try:
+        # A construção do índice léxico consome o fluxo e, com isso, conduz
+        # todo o pipeline; só os termos (compactados) ficam acumulados
+        lexical_index = LexicalIndex.build(iter_indexed_chunk_terms())
+        index = index_builder.finish()
+        if index is None:
+            logger.warning("Nenhum chunk com embedding: o índice não foi criado.")
+            writer.discard()
+            return 0
+        writer.finish(logger, index)
+    except BaseException:
+        writer.discard()
+        raise
+    finally:
+        cache.log_statistics()
+        cache.close()
+
+    save_lexical_index(logger, lexical_index, get_index_file(artifact_suffix, "mmap"))
+    logger.info("Embeddings e índice salvos (%d chunks).", len(lexical_index))
+    return len(lexical_index)
+
+
+def load_incremental_embeddings(
+    logger, chunks_file: str, index_file: str
+) -> tuple[dict[int, str], faiss.IndexIDMap2 | None]:
+    if not (os.path.exists(chunks_file) and os.path.exists(index_file)):
+        return {}, None
+
+    logger.info("Carregando chunks e índice incremental do disco.")
+    with open(chunks_file, "rb") as f:
+        chunks = pickle.load(f)
+    return chunks, faiss.read_index(index_file)
+
+
+@timed
+def update_code_embeddings_incrementally(
+    logger,
+    client,
+    repo_path: str,
+    chunks_file: str = "chunks_code_incremental.pkl",
+    index_file: str = "faiss_code_incremental.index",
+    manifest_file: str = "manifest_code.json",
+) -> tuple[dict[int, str], faiss.IndexIDMap2 | None]:
+    logger.info("Atualizando incrementalmente o índice do repositório %s", repo_path)
+
+    manifest = load_manifest(logger, manifest_file)
+    chunks, index = load_incremental_embeddings(logger, chunks_file, index_file)
+
+    if index is None or not isinstance(chunks, dict) or len(manifest["files"]) == 0:
+        # Artefatos ausentes ou gerados pelo modo completo: reconstrói do zero
+        manifest = {"next_id": 0, "files": {}}
+        chunks = {}
+        index = None
+
+    file_names = get_all_python_files_from_repository(logger, repo_path)
+    changed_files, file_states, removed_files = diff_repository_against_manifest(
+        logger, manifest, repo_path, file_names
+    )
+
+    stale_ids: List[int] = []
+    for relative_path in removed_files + list(changed_files):
+        if relative_path in manifest["files"]:
+            stale_ids.extend(manifest["files"][relative_path]["ids"])
+
+    if len(stale_ids) > 0 and index is not None:
+        remove_from_id_index(logger, index, stale_ids)
+        for chunk_id in stale_ids:
+            chunks.pop(chunk_id, None)
+
+    next_id = manifest["next_id"]
+    new_chunks: List[str] = []
+    new_ids: List[int] = []
+    relative_paths = {
+        os.path.join(repo_path, relative_path): relative_path
+        for relative_path in changed_files
+    }
+    # O conteúdo lido na comparação com o manifesto é reaproveitado
+    file_results = process_files_in_parallel(
+        logger,
+        list(relative_paths),
+        repo_path=repo_path,
+        file_contents={
+            file_name: changed_files[relative_path]
+            for file_name, relative_path in relative_paths.items()
+        },
+    )
+    for result in file_results:
+        relative_path = relative_paths[result.file_name]
+        if result.error is not None:
+            # Fora do manifesto, o arquivo é processado de novo na próxima execução
+            del file_states[relative_path]
+            continue
+
+        file_ids = list(range(next_id, next_id + len(result.chunks)))
+        next_id += len(result.chunks)
+
+        file_states[relative_path]["ids"] = file_ids
+        new_chunks.extend(result.chunks)
+        new_ids.extend(file_ids)
+
+    logger.debug("Número de chunks novos ou alterados: %d", len(new_chunks))
+
+    if len(new_chunks) > 0:
+        cache = get_embedding_cache(logger)
+        new_embeddings = create_embeddings(logger, new_chunks, client, cache=cache)
+        cache.log_statistics()
+        cache.close()
+
+        # Chunks cujo embedding falhou não entram no índice
+        valid_positions = [
+            position
+            for position, embedding in enumerate(new_embeddings)
+            if len(embedding) > 0
+        ]
+        if len(valid_positions) > 0:
+            if index is None:
+                index = create_faiss_id_index(
+                    logger, [new_embeddings[position] for position in valid_positions]
+                )
+            add_to_id_index(
+                index,
+                [new_embeddings[position] for position in valid_positions],
+                [new_ids[position] for position in valid_positions],
+            )
+            for position in valid_positions:
+                chunks[new_ids[position]] = new_chunks[position]
+
+    manifest = {"next_id": next_id, "files": file_states}
+
+    if index is not None:
+        with open(chunks_file, "wb") as f:
+            pickle.dump(chunks, f)
+        faiss.write_index(index, index_file)
+        # Reconstruir o índice léxico é barato: as pontuações BM25 dependem das
+        # estatísticas de todos os chunks
+        save_lexical_index(
+            logger,
+            LexicalIndex.build(
+                (tokenize_code(chunk) for chunk in chunks.values()), list(chunks)
+            ),
+            index_file,
+        )
+        save_manifest(logger, manifest, manifest_file)
+        logger.info("Índice incremental contém %d vetores.", index.ntotal)
+
+    return chunks, index
+
+
+def get_storage_format() -> str:
+    load_environment()
+    return os.getenv("FORMATO_ARMAZENAMENTO", "pickle").lower()
+
+
+def is_incremental_indexing_enabled() -> bool:
+    load_environment()
+    return os.getenv("INDEXACAO_INCREMENTAL", "false").lower() in ("1", "true", "sim")
+
+
+def get_index_file(artifact_suffix: str, artifact_format: str) -> str:
+    # Cada formato (pickle, mmap, incremental) tem o próprio índice FAISS: os
+    # chunks de um formato nunca são combinados com os vetores de outro
+    if artifact_format == "pickle":
+        return f"faiss{artifact_suffix}.index"
+    return f"faiss{artifact_suffix}_{artifact_format}.index"
+
+
+def get_code_artifact_format(incremental: bool | None = None) -> str:
+    if incremental is None:
+        incremental = is_incremental_indexing_enabled()
+    return "incremental" if incremental else get_storage_format()
+
+
+@timed
+def store_embeddings(logger, embeddings, chunks, index, artifact_suffix: str = ""):
+    check_index_can_be_stored(index)
+    if get_storage_format() == "mmap":
+        save_embeddings_mmap(
+            logger=logger,
+            embeddings=embeddings,
+            chunks=chunks,
+            index=index,
+            embeddings_file=f"embeddings{artifact_suffix}.npy",
+            chunks_file=f"chunks{artifact_suffix}.bin",
+            offsets_file=f"chunks{artifact_suffix}_offsets.npy",
+            index_file=get_index_file(artifact_suffix, "mmap"),
+        )
+    else:
+        save_embeddings(
+            logger=logger,
+            embeddings=embeddings,
+            chunks=chunks,
+            index=index,
+            embeddings_file=f"embeddings{artifact_suffix}.pkl",
+            chunks_file=f"chunks{artifact_suffix}.pkl",
+            index_file=get_index_file(artifact_suffix, "pickle"),
+        )
+
+
+@timed
+def load_stored_embeddings(logger, artifact_suffix: str = ""):
+    if get_storage_format() == "mmap":
+        return load_embeddings_mmap(
+            logger=logger,
+            embeddings_file=f"embeddings{artifact_suffix}.npy",
+            chunks_file=f"chunks{artifact_suffix}.bin",
+            offsets_file=f"chunks{artifact_suffix}_offsets.npy",
+            index_file=get_index_file(artifact_suffix, "mmap"),
+        )
+
+    return load_embeddings(
+        logger=logger,
+        embeddings_file=f"embeddings{artifact_suffix}.pkl",
+        chunks_file=f"chunks{artifact_suffix}.pkl",
+        index_file=get_index_file(artifact_suffix, "pickle"),
+    )
+
+
 def save_embeddings(
     logger,
     embeddings: List[List[float]],
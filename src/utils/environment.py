@@ -0,0 +1,14 @@
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def load_environment() -> bool:
+    """Carrega o arquivo ``.env`` uma única vez por processo.
+
+    As configurações continuam sendo lidas com ``os.getenv`` onde são usadas;
+    variáveis já definidas no ambiente têm precedência sobre o arquivo.
+    """
+    # Importado aqui para não pesar na inicialização de quem não lê configurações
+    from dotenv import load_dotenv  # pylint: disable=import-outside-toplevel
+
+    return load_dotenv()
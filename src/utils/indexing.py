@@ -1,20 +1,319 @@
-from typing import List
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Tuple
 import faiss
 import numpy as np
+from utils.environment import load_environment
+from utils.instrumentation import timed
 
 
-def create_faiss_index(logger, embeddings: List[List[float]]) -> faiss.IndexFlatL2:
-    logger.info("Criando índice FAISS.")
-    dimension = len(embeddings[0])
-    index = faiss.IndexFlatL2(dimension)
-    index.add(np.array(embeddings).astype("float32"))
+@dataclass
+class IndexSettings:
+    """Configuração do tipo de índice FAISS e dos parâmetros de busca.
+
+    ``index_type`` aceita ``flat`` (busca exata), ``ivf_flat``, ``ivf_pq`` e
+    ``hnsw``. Índices aproximados só são usados a partir de
+    ``min_vectors_for_ann`` vetores; abaixo disso a busca continua exata.
+    """
+
+    index_type: str = "flat"
+    min_vectors_for_ann: int = 10_000
+    nlist: int | None = None
+    pq_m: int = 16
+    pq_nbits: int = 8
+    hnsw_m: int = 32
+    ef_construction: int = 40
+    nprobe: int = 8
+    ef_search: int = 64
+
+    @classmethod
+    def from_environment(cls) -> "IndexSettings":
+        load_environment()
+        nlist = os.getenv("FAISS_NLIST")
+        return cls(
+            index_type=os.getenv("FAISS_TIPO_INDICE", "flat").lower(),
+            min_vectors_for_ann=int(os.getenv("FAISS_MIN_VETORES_ANN", "10000")),
+            nlist=int(nlist) if nlist else None,
+            pq_m=int(os.getenv("FAISS_PQ_M", "16")),
+            pq_nbits=int(os.getenv("FAISS_PQ_NBITS", "8")),
+            hnsw_m=int(os.getenv("FAISS_HNSW_M", "32")),
+            ef_construction=int(os.getenv("FAISS_EF_CONSTRUCTION", "40")),
+            nprobe=int(os.getenv("FAISS_NPROBE", "8")),
+            ef_search=int(os.getenv("FAISS_EF_SEARCH", "64")),
+        )
+
+
+def get_index_factory_string(settings: IndexSettings, number_of_vectors: int) -> str:
+    if (
+        settings.index_type == "flat"
+        or number_of_vectors < settings.min_vectors_for_ann
+    ):
+        return "Flat"
+
+    # Regra usual da documentação do FAISS: nlist ~ 4 * sqrt(N)
+    nlist = settings.nlist or max(1, int(4 * math.sqrt(number_of_vectors)))
+    # O treinamento do IVF exige ao menos um vetor por lista
+    nlist = min(nlist, number_of_vectors)
+
+    if settings.index_type == "ivf_flat":
+        return f"IVF{nlist},Flat"
+    if settings.index_type == "ivf_pq":
+        return f"IVF{nlist},PQ{settings.pq_m}x{settings.pq_nbits}"
+    if settings.index_type == "hnsw":
+        return f"HNSW{settings.hnsw_m},Flat"
+
+    raise ValueError(f"Tipo de índice FAISS desconhecido: {settings.index_type}")
+
+
+def build_faiss_index(
+    logger, vectors: np.ndarray, settings: IndexSettings
+) -> faiss.Index:
+    factory_string = get_index_factory_string(settings, len(vectors))
+    logger.info(
+        "Criando índice FAISS do tipo %s para %d vetores.",
+        factory_string,
+        len(vectors),
+    )
+
+    index = faiss.index_factory(vectors.shape[1], factory_string)
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efConstruction = settings.ef_construction
+    if not index.is_trained:
+        logger.info("Treinando o índice FAISS.")
+        index.train(vectors)
+
+    return index
+
+
+class StreamingIndexBuilder:
+    """Monta o índice FAISS a partir de lotes de vetores, à medida que chegam.
+
+    Índices exatos recebem cada lote diretamente. Para os aproximados, os
+    primeiros ``min_vectors_for_ann`` vetores ficam guardados e treinam o
+    índice; se o fluxo terminar antes disso, o índice continua exato, como em
+    ``create_faiss_index``.
+    """
+
+    def __init__(self, logger, settings: IndexSettings | None = None):
+        self.logger = logger
+        self.settings = settings or IndexSettings.from_environment()
+        self.index: faiss.Index | None = None
+        self.pending: List[np.ndarray] = []
+        self.pending_vectors = 0
+
+    def add(self, vectors: np.ndarray):
+        if self.index is not None:
+            self.index.add(vectors)
+            return
+
+        self.pending.append(vectors)
+        self.pending_vectors += len(vectors)
+        if (
+            self.settings.index_type == "flat"
+            or self.pending_vectors >= self.settings.min_vectors_for_ann
+        ):
+            self.build_from_pending()
+
+    def build_from_pending(self):
+        # Nos índices IVF, o nlist padrão é calculado sobre a amostra de treinamento
+        training_vectors = np.concatenate(self.pending)
+        self.index = build_faiss_index(self.logger, training_vectors, self.settings)
+        self.index.add(training_vectors)
+        self.pending = []
+        self.pending_vectors = 0
+
+    def finish(self) -> faiss.Index | None:
+        if self.index is None and len(self.pending) > 0:
+            self.build_from_pending()
+        return self.index
+
+
+@timed
+def create_faiss_index(
+    logger, embeddings: List[List[float]], settings: IndexSettings | None = None
+) -> faiss.Index:
+    if settings is None:
+        settings = IndexSettings.from_environment()
+
+    vectors = np.array(embeddings).astype("float32")
+    index = build_faiss_index(logger, vectors, settings)
+    index.add(vectors)
     return index
 
 
+def unwrap_index(index: faiss.Index) -> faiss.Index:
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        return faiss.downcast_index(index.index)
+    return index
+
+
+def get_search_parameters(
+    index: faiss.Index, settings: IndexSettings
+) -> faiss.SearchParameters | None:
+    base_index = unwrap_index(index)
+
+    if isinstance(base_index, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(efSearch=settings.ef_search)
+
+    if isinstance(base_index, faiss.IndexIVF):
+        return faiss.SearchParametersIVF(nprobe=settings.nprobe)
+
+    return None
+
+
+# Nos identificadores globais, os bits baixos guardam a posição do chunk no
+# shard e os altos, o número do shard
+SHARD_ID_BITS = 40
+
+
+def to_global_ids(shard_number: int, ids: np.ndarray) -> np.ndarray:
+    ids = np.asarray(ids, dtype=np.int64)
+    return np.where(ids >= 0, (shard_number << SHARD_ID_BITS) | ids, -1)
+
+
+def split_global_id(global_id: int) -> Tuple[int, int]:
+    global_id = int(global_id)
+    return global_id >> SHARD_ID_BITS, global_id & ((1 << SHARD_ID_BITS) - 1)
+
+
+class ShardedIndex:
+    """Índices FAISS independentes, um por repositório, pesquisados como um só.
+
+    Cada shard é pesquisado em uma thread (o FAISS libera o GIL durante a
+    busca) e os ``k`` vizinhos mais próximos de todos são combinados pela
+    distância. Os identificadores devolvidos são globais (ver
+    ``to_global_ids``).
+    """
+
+    def __init__(self, shards: dict[int, faiss.Index], max_workers: int | None = None):
+        self.shards = shards
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or min(len(shards), os.cpu_count() or 1),
+            thread_name_prefix="busca-shard",
+        )
+
+    @property
+    def ntotal(self) -> int:
+        return sum(shard.ntotal for shard in self.shards.values())
+
+    @property
+    def d(self) -> int:
+        return next(iter(self.shards.values())).d
+
+    def search_shard(
+        self, shard_number: int, queries: np.ndarray, k: int, settings: IndexSettings
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        shard = self.shards[shard_number]
+        distances, ids = shard.search(
+            queries, k, params=get_search_parameters(shard, settings)
+        )
+        return distances, to_global_ids(shard_number, ids)
+
+    def search(
+        self, queries: np.ndarray, k: int, settings: IndexSettings
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        results = list(
+            self.executor.map(
+                lambda shard_number: self.search_shard(
+                    shard_number, queries, k, settings
+                ),
+                self.shards,
+            )
+        )
+        distances = np.concatenate([result[0] for result in results], axis=1)
+        ids = np.concatenate([result[1] for result in results], axis=1)
+        # Posições vazias (-1) de um shard não podem vencer vizinhos reais de outro
+        distances = np.where(ids >= 0, distances, np.inf).astype(np.float32)
+
+        best = np.argsort(distances, axis=1, kind="stable")[:, :k]
+        return (
+            np.take_along_axis(distances, best, axis=1),
+            np.take_along_axis(ids, best, axis=1),
+        )
+
+
+def run_search(
+    index: faiss.Index | ShardedIndex,
+    queries: np.ndarray,
+    k: int,
+    settings: IndexSettings,
+) -> Tuple[np.ndarray, np.ndarray]:
+    if isinstance(index, ShardedIndex):
+        return index.search(queries, k, settings)
+    return index.search(queries, k, params=get_search_parameters(index, settings))
+
+
+@timed
 def search_index(
-    logger, index: faiss.IndexFlatL2, query_embedding: List[float], k: int = 5
+    logger,
+    index: faiss.Index,
+    query_embedding: List[float],
+    k: int = 5,
+    settings: IndexSettings | None = None,
 ):
     logger.info("Pesquisando no índice FAISS por embeddings similares.")
+    if settings is None:
+        settings = IndexSettings.from_environment()
+
     query_embedding = np.array(query_embedding).astype("float32").reshape(1, -1)
-    distances, indices = index.search(query_embedding, k)
+    distances, indices = run_search(index, query_embedding, k, settings)
     return indices[0], distances[0]
+
+
+@timed
+def create_faiss_id_index(
+    logger,
+    embeddings: List[List[float]],
+    settings: IndexSettings | None = None,
+) -> faiss.IndexIDMap2:
+    logger.info("Criando índice FAISS com identificadores explícitos.")
+    if settings is None:
+        settings = IndexSettings.from_environment()
+
+    if settings.index_type == "hnsw":
+        # O HNSW do FAISS não permite remover vetores, o que o modo incremental exige
+        logger.warning(
+            "Índice HNSW não suporta remoção; usando busca exata no modo incremental."
+        )
+        settings = IndexSettings(index_type="flat")
+
+    vectors = np.array(embeddings).astype("float32")
+    return faiss.IndexIDMap2(build_faiss_index(logger, vectors, settings))
+
+
+def add_to_id_index(
+    index: faiss.IndexIDMap2, embeddings: List[List[float]], ids: List[int]
+):
+    index.add_with_ids(
+        np.array(embeddings).astype("float32"), np.array(ids).astype("int64")
+    )
+
+
+def remove_from_id_index(logger, index: faiss.IndexIDMap2, ids: List[int]) -> int:
+    removed = index.remove_ids(np.array(ids).astype("int64"))
+    logger.debug("Removidos %d vetores do índice FAISS.", removed)
+    return removed
+
+
+@timed
+def search_index_batch(
+    logger,
+    index: faiss.Index,
+    query_embeddings: List[List[float]],
+    k: int = 5,
+    settings: IndexSettings | None = None,
+):
+    logger.info(
+        "Pesquisando no índice FAISS por embeddings similares a %d consultas.",
+        len(query_embeddings),
+    )
+    if settings is None:
+        settings = IndexSettings.from_environment()
+
+    query_matrix = (
+        np.array(query_embeddings).astype("float32").reshape(len(query_embeddings), -1)
+    )
+    distances, indices = run_search(index, query_matrix, k, settings)
+    return indices, distances
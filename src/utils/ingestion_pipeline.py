@@ -0,0 +1,98 @@
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Iterable, Iterator, TypeVar
+from utils.environment import load_environment
+from utils.instrumentation import metrics
+
+T = TypeVar("T")
+
+# Marca o fim dos itens de uma etapa na fila
+END_OF_STAGE = object()
+# Intervalo em que uma etapa bloqueada verifica se o consumidor desistiu
+STOP_CHECK_SECONDS = 0.1
+
+
+@dataclass
+class IngestionSettings:
+    """Configuração da ingestão em streaming do repositório de código.
+
+    Cada fila entre etapas guarda no máximo ``queue_size`` itens (arquivos
+    processados ou lotes de embeddings); uma etapa com a fila cheia espera a
+    seguinte, o que limita a memória usada independentemente do tamanho do
+    repositório.
+    """
+
+    enabled: bool = True
+    queue_size: int = 4
+    batch_size: int = 256
+
+    @classmethod
+    def from_environment(cls) -> "IngestionSettings":
+        load_environment()
+        return cls(
+            enabled=os.getenv("INGESTAO_STREAMING", "true").lower()
+            in ("1", "true", "sim"),
+            queue_size=int(os.getenv("INGESTAO_TAMANHO_FILA", "4")),
+            batch_size=int(os.getenv("INGESTAO_TAMANHO_LOTE", "256")),
+        )
+
+
+def iter_in_background(
+    logger, items: Iterable[T], stage: str, max_items: int
+) -> Iterator[T]:
+    """Consome ``items`` em uma thread própria e gera os mesmos itens, na mesma ordem.
+
+    A thread produtora adianta no máximo ``max_items`` itens. Erros da etapa
+    são relançados para quem consome; se quem consome parar antes do fim, a
+    produção também para.
+    """
+    buffer: queue.Queue = queue.Queue(maxsize=max(1, max_items))
+    stopped = threading.Event()
+    errors: list[BaseException] = []
+
+    def put(item) -> bool:
+        while not stopped.is_set():
+            try:
+                buffer.put(item, timeout=STOP_CHECK_SECONDS)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put(item):
+                    return
+        except BaseException as error:  # pylint: disable=broad-exception-caught
+            errors.append(error)
+        finally:
+            close = getattr(items, "close", None)
+            if close is not None:
+                close()
+            put(END_OF_STAGE)
+
+    thread = threading.Thread(target=produce, name=f"ingestao-{stage}", daemon=True)
+    thread.start()
+    logger.debug("Etapa %s iniciada em segundo plano.", stage)
+
+    waited = 0.0
+    try:
+        while True:
+            start = time.perf_counter()
+            item = buffer.get()
+            waited += time.perf_counter() - start
+            if item is END_OF_STAGE:
+                break
+            yield item
+
+        if len(errors) > 0:
+            raise errors[0]
+    finally:
+        stopped.set()
+        thread.join()
+        # Tempo em que a etapa seguinte ficou parada esperando por esta
+        metrics.record_duration(f"ingestion_pipeline.espera_{stage}", waited)
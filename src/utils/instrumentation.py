@@ -0,0 +1,165 @@
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from utils.environment import load_environment
+
+
+class Metrics:
+    """Tempos por etapa, contadores e tokens consumidos durante a execução.
+
+    Os tempos são inclusivos: uma etapa que chama outra também contabiliza o
+    tempo da etapa interna. Cada processo tem as próprias métricas; os
+    processos de trabalho não são somados às do processo principal.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started = time.time()
+            self.stages: dict[str, dict[str, float]] = {}
+            self.counters: dict[str, int] = {}
+            self.tokens: dict[str, dict[str, int]] = {}
+
+    def record_duration(self, stage: str, seconds: float):
+        with self.lock:
+            statistics = self.stages.setdefault(
+                stage, {"chamadas": 0, "tempo_total_s": 0.0, "tempo_max_s": 0.0}
+            )
+            statistics["chamadas"] += 1
+            statistics["tempo_total_s"] += seconds
+            statistics["tempo_max_s"] = max(statistics["tempo_max_s"], seconds)
+
+    def increment(self, counter: str, amount: int = 1):
+        with self.lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def record_usage(self, api: str, usage):
+        # Respostas sem ``usage`` (clientes falsos, erros) são ignoradas
+        if usage is None:
+            return
+        with self.lock:
+            totals = self.tokens.setdefault(api, {})
+            for field in ("prompt_tokens", "completion_tokens", "total_tokens"):
+                value = getattr(usage, field, None)
+                if isinstance(value, int):
+                    totals[field] = totals.get(field, 0) + value
+
+    def summary(self) -> dict:
+        with self.lock:
+            return {
+                "inicio": datetime.fromtimestamp(
+                    self.started, timezone.utc
+                ).isoformat(),
+                "duracao_total_s": round(time.time() - self.started, 6),
+                "etapas": {
+                    stage: {
+                        "chamadas": int(statistics["chamadas"]),
+                        "tempo_total_s": round(statistics["tempo_total_s"], 6),
+                        "tempo_medio_ms": round(
+                            1000 * statistics["tempo_total_s"] / statistics["chamadas"],
+                            4,
+                        ),
+                        "tempo_max_ms": round(1000 * statistics["tempo_max_s"], 4),
+                    }
+                    for stage, statistics in sorted(self.stages.items())
+                },
+                "contadores": dict(sorted(self.counters.items())),
+                "tokens": {api: dict(totals) for api, totals in self.tokens.items()},
+            }
+
+
+metrics = Metrics()
+
+
+def get_stage_name(func) -> str:
+    return f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+
+# Marca o fim de um gerador medido por ``timed``
+END_OF_GENERATOR = object()
+
+
+def time_generator_function(func, stage: str):
+    @functools.wraps(func)
+    def generator_wrapper(*args, **kwargs):
+        elapsed = 0.0
+        generator = func(*args, **kwargs)
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(generator, END_OF_GENERATOR)
+                finally:
+                    elapsed += time.perf_counter() - start
+                if item is END_OF_GENERATOR:
+                    break
+                yield item
+        finally:
+            generator.close()
+            metrics.record_duration(stage, elapsed)
+
+    return generator_wrapper
+
+
+def time_function(func, stage: str):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            metrics.record_duration(stage, time.perf_counter() - start)
+
+    return wrapper
+
+
+def timed(func):
+    """Registra a duração de cada chamada da função nas métricas da execução.
+
+    Em funções geradoras é medido apenas o tempo gasto dentro do gerador, sem
+    o tempo de quem consome os itens.
+    """
+    stage = get_stage_name(func)
+    if inspect.isgeneratorfunction(func):
+        return time_generator_function(func, stage)
+    return time_function(func, stage)
+
+
+@contextmanager
+def measure(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.record_duration(stage, time.perf_counter() - start)
+
+
+def write_metrics_summary(logger, summary_file: str | None = None) -> dict:
+    if summary_file is None:
+        load_environment()
+        summary_file = os.getenv("METRICAS_ARQUIVO", "metricas_execucao.json")
+
+    summary = metrics.summary()
+    for stage, statistics in summary["etapas"].items():
+        logger.info(
+            "Etapa %s: %d chamadas, %.3f s no total (máx. %.1f ms).",
+            stage,
+            statistics["chamadas"],
+            statistics["tempo_total_s"],
+            statistics["tempo_max_ms"],
+        )
+    for api, totals in summary["tokens"].items():
+        logger.info("Tokens consumidos (%s): %s", api, totals)
+
+    with open(summary_file, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+    logger.info("Resumo das métricas da execução salvo em %s.", summary_file)
+    return summary
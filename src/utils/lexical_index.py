@@ -0,0 +1,235 @@
+import os
+from array import array
+from typing import Iterable, List, Sequence, Tuple
+import numpy as np
+from utils.environment import load_environment
+from utils.embedders import IDENTIFIER_PATTERN, split_identifier
+from utils.indexing import to_global_ids
+
+# Parâmetros usuais do BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Constante da fusão por posição recíproca (reciprocal rank fusion)
+RRF_K = 60
+
+
+def tokenize_code(text: str) -> List[str]:
+    """Termos de um trecho de código: identificadores e suas partes, em minúsculas."""
+    return [
+        part
+        for identifier in IDENTIFIER_PATTERN.findall(text)
+        for part in split_identifier(identifier)
+    ]
+
+
+class LexicalIndex:
+    """Índice invertido com pontuação BM25 sobre os identificadores dos chunks.
+
+    As listas de ocorrências ficam em vetores contíguos: as do termo ``t``
+    ocupam ``offsets[t]:offsets[t + 1]`` de ``rows`` e ``weights``. O peso
+    BM25 de cada par (termo, chunk) não depende da consulta e é calculado na
+    construção, de modo que a busca apenas soma pesos.
+    """
+
+    def __init__(
+        self,
+        terms: Sequence[str],
+        offsets: np.ndarray,
+        rows: np.ndarray,
+        weights: np.ndarray,
+        doc_ids: np.ndarray,
+    ):
+        self.term_ids = {term: term_id for term_id, term in enumerate(terms)}
+        self.offsets = offsets
+        self.rows = rows
+        self.weights = weights
+        self.doc_ids = doc_ids
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    @classmethod
+    def build(
+        cls,
+        documents_terms: Iterable[List[str]],
+        doc_ids: Sequence[int] | None = None,
+        k1: float = BM25_K1,
+        b: float = BM25_B,
+    ) -> "LexicalIndex":
+        vocabulary: dict[str, int] = {}
+        # Vetores compactos: os termos podem chegar de um fluxo de chunks que
+        # nunca fica inteiro em memória
+        token_term_ids = array("q")
+        doc_lengths = array("q")
+        for terms in documents_terms:
+            token_term_ids.extend(
+                vocabulary.setdefault(term, len(vocabulary)) for term in terms
+            )
+            doc_lengths.append(len(terms))
+
+        number_of_documents = len(doc_lengths)
+        if doc_ids is None:
+            doc_ids = range(number_of_documents)
+
+        # Cada ocorrência vira a chave (termo, chunk); as chaves únicas, já
+        # ordenadas por termo, são as listas de ocorrências com as frequências
+        token_rows = np.repeat(
+            np.arange(number_of_documents, dtype=np.int64), doc_lengths
+        )
+        keys = (
+            np.asarray(token_term_ids, dtype=np.int64) * max(number_of_documents, 1)
+            + token_rows
+        )
+        keys, counts = np.unique(keys, return_counts=True)
+        posting_term_ids = keys // max(number_of_documents, 1)
+        rows = (keys % max(number_of_documents, 1)).astype(np.int32)
+        frequencies = counts.astype(np.float32)
+
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(posting_term_ids, minlength=len(vocabulary)), out=offsets[1:]
+        )
+        terms = list(vocabulary)
+
+        lengths = np.asarray(doc_lengths, dtype=np.float32)
+        average_length = lengths.mean() if number_of_documents > 0 else 0.0
+        document_frequencies = np.diff(offsets).astype(np.float32)
+        idf = np.log1p(
+            (number_of_documents - document_frequencies + 0.5)
+            / (document_frequencies + 0.5)
+        )
+
+        normalization = k1 * (1 - b + b * lengths / max(average_length, 1.0))
+        weights = (
+            np.repeat(idf, np.diff(offsets))
+            * frequencies
+            * (k1 + 1)
+            / (frequencies + normalization[rows])
+        ).astype(np.float32)
+
+        return cls(terms, offsets, rows, weights, np.asarray(doc_ids, dtype=np.int64))
+
+    def search(self, query: str, k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """Devolve os identificadores dos ``k`` chunks mais relevantes e suas pontuações."""
+        slices = [
+            (self.offsets[term_id], self.offsets[term_id + 1])
+            for term_id in (
+                self.term_ids.get(term) for term in set(tokenize_code(query))
+            )
+            if term_id is not None
+        ]
+        if len(slices) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        rows = np.concatenate([self.rows[start:end] for start, end in slices])
+        weights = np.concatenate([self.weights[start:end] for start, end in slices])
+
+        if len(rows) > len(self.doc_ids) // 8:
+            # Termos frequentes: acumular em um vetor denso evita ordenar as ocorrências
+            scores = np.bincount(rows, weights=weights, minlength=len(self.doc_ids))
+            candidates = np.arange(len(self.doc_ids))
+        else:
+            candidates, positions = np.unique(rows, return_inverse=True)
+            scores = np.bincount(positions, weights=weights)
+
+        if len(candidates) > k:
+            best = np.argpartition(-scores, k - 1)[:k]
+        else:
+            best = np.arange(len(candidates))
+        best = best[np.argsort(-scores[best], kind="stable")]
+        best = best[scores[best] > 0]
+
+        return self.doc_ids[candidates[best]], scores[best].astype(np.float32)
+
+    def save(self, index_file: str):
+        terms = sorted(self.term_ids, key=self.term_ids.get)
+        np.savez(
+            index_file,
+            terms=np.array(terms, dtype=np.str_),
+            offsets=self.offsets,
+            rows=self.rows,
+            weights=self.weights,
+            doc_ids=self.doc_ids,
+        )
+
+
+class ShardedLexicalIndex:
+    """Índices léxicos de vários shards, com os identificadores globais do ``ShardedIndex``.
+
+    As pontuações BM25 de cada shard usam as estatísticas do próprio shard; os
+    ``k`` melhores de cada um são combinados pela pontuação.
+    """
+
+    def __init__(self, shards: dict[int, LexicalIndex]):
+        self.shards = shards
+
+    def __len__(self) -> int:
+        return sum(len(lexical_index) for lexical_index in self.shards.values())
+
+    def search(self, query: str, k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        results = []
+        for shard_number, lexical_index in self.shards.items():
+            doc_ids, scores = lexical_index.search(query, k)
+            results.append((to_global_ids(shard_number, doc_ids), scores))
+
+        doc_ids = np.concatenate([result[0] for result in results])
+        scores = np.concatenate([result[1] for result in results])
+        best = np.argsort(-scores, kind="stable")[:k]
+        return doc_ids[best], scores[best]
+
+
+def is_hybrid_search_enabled() -> bool:
+    load_environment()
+    return os.getenv("BUSCA_HIBRIDA", "true").lower() in ("1", "true", "sim")
+
+
+def get_lexical_index_file(index_file: str) -> str:
+    # O índice léxico acompanha o índice FAISS: faiss_code.index -> bm25_code.npz
+    directory, file_name = os.path.split(index_file)
+    name = os.path.splitext(file_name)[0].replace("faiss", "bm25", 1)
+    return os.path.join(directory, name + ".npz")
+
+
+def save_lexical_index(logger, lexical_index: LexicalIndex, index_file: str):
+    lexical_index_file = get_lexical_index_file(index_file)
+    logger.info(
+        "Salvando índice léxico com %d chunks em %s.",
+        len(lexical_index),
+        lexical_index_file,
+    )
+    lexical_index.save(lexical_index_file)
+
+
+def load_lexical_index(logger, index_file: str) -> LexicalIndex | None:
+    lexical_index_file = get_lexical_index_file(index_file)
+    if not os.path.exists(lexical_index_file):
+        logger.warning(
+            "Índice léxico %s não encontrado; a busca usará apenas o índice FAISS.",
+            lexical_index_file,
+        )
+        return None
+
+    with np.load(lexical_index_file) as data:
+        lexical_index = LexicalIndex(
+            data["terms"].tolist(),
+            data["offsets"],
+            data["rows"],
+            data["weights"],
+            data["doc_ids"],
+        )
+    logger.info("Índice léxico carregado com %d chunks.", len(lexical_index))
+    return lexical_index
+
+
+def reciprocal_rank_fusion(
+    rankings: List[Sequence[int]], k: int | None = None, rrf_k: int = RRF_K
+) -> List[int]:
+    """Combina rankings pela soma de 1 / (rrf_k + posição) de cada item."""
+    scores: dict[int, float] = {}
+    for ranking in rankings:
+        for position, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (rrf_k + position + 1)
+
+    fused = sorted(scores, key=lambda doc_id: scores[doc_id], reverse=True)
+    return fused if k is None else fused[:k]
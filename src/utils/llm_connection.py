@@ -1,20 +1,21 @@
 import os
-from dotenv import load_dotenv
-from openai import OpenAI
+from utils.environment import load_environment
 
 
 def get_llm_client(logger):
     # Carregar variáveis de ambiente
     api_key = get_api_key(logger)
 
-    # Criar o cliente OpenAI
+    # Criar o cliente OpenAI; o pacote é pesado e só é importado quando usado
+    from openai import OpenAI  # pylint: disable=import-outside-toplevel
+
     client = OpenAI(api_key=api_key, max_retries=5)
 
     return client
 
 
 def get_api_key(logger):
-    load_dotenv()
+    load_environment()
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         logger.error(
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import os
+from typing import List, Tuple
+
+# Estrutura do manifesto:
+# {
+#     "next_id": int,
+#     "files": {
+#         caminho_relativo: {"mtime": float, "size": int, "sha256": str, "ids": [int]}
+#     }
+# }
+
+
+def load_manifest(logger, manifest_file: str) -> dict:
+    if os.path.exists(manifest_file):
+        logger.info("Carregando manifesto de indexação %s.", manifest_file)
+        with open(manifest_file, mode="r", encoding="utf-8") as f:
+            return json.load(f)
+
+    logger.warning("Manifesto de indexação %s não encontrado.", manifest_file)
+    return {"next_id": 0, "files": {}}
+
+
+def save_manifest(logger, manifest: dict, manifest_file: str):
+    logger.info("Salvando manifesto de indexação %s.", manifest_file)
+
+    # Escrita atômica para não corromper o manifesto em caso de interrupção
+    temporary_file = manifest_file + ".tmp"
+    with open(temporary_file, mode="w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(temporary_file, manifest_file)
+
+
+def hash_file_content(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def diff_repository_against_manifest(
+    logger, manifest: dict, repo_path: str, file_names: List[str]
+) -> Tuple[dict[str, str], dict[str, dict], List[str]]:
+    """Compara os arquivos do repositório com o manifesto.
+
+    Retorna os arquivos adicionados ou modificados (caminho relativo -> conteúdo),
+    o novo estado de todos os arquivos e a lista de arquivos removidos. O conteúdo
+    só é lido quando o mtime ou o tamanho do arquivo mudaram.
+    """
+    known_files: dict[str, dict] = manifest["files"]
+    changed_files: dict[str, str] = {}
+    file_states: dict[str, dict] = {}
+
+    for file_name in file_names:
+        relative_path = os.path.relpath(file_name, repo_path)
+        stat = os.stat(file_name)
+        known_state = known_files.get(relative_path)
+
+        if (
+            known_state is not None
+            and known_state["mtime"] == stat.st_mtime
+            and known_state["size"] == stat.st_size
+        ):
+            file_states[relative_path] = known_state
+            continue
+
+        try:
+            with open(file_name, mode="r", encoding="utf-8") as code_file:
+                file_content = code_file.read()
+        except (OSError, UnicodeDecodeError) as error:
+            # Sem estado no manifesto, os vetores antigos são removidos e o
+            # arquivo é lido de novo na próxima execução
+            logger.error("Falha ao ler o arquivo %s: %s", file_name, error)
+            continue
+        content_hash = hash_file_content(file_content)
+
+        state = {
+            "mtime": stat.st_mtime,
+            "size": stat.st_size,
+            "sha256": content_hash,
+            "ids": [],
+        }
+        if known_state is not None and known_state["sha256"] == content_hash:
+            # Apenas o mtime mudou; os vetores existentes continuam válidos
+            state["ids"] = known_state["ids"]
+        else:
+            changed_files[relative_path] = file_content
+        file_states[relative_path] = state
+
+    removed_files = [
+        relative_path
+        for relative_path in known_files
+        if relative_path not in file_states
+    ]
+
+    logger.info(
+        "Arquivos alterados ou novos: %d; removidos: %d; inalterados: %d.",
+        len(changed_files),
+        len(removed_files),
+        len(file_states) - len(changed_files),
+    )
+
+    return changed_files, file_states, removed_files
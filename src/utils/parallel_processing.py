@@ -0,0 +1,211 @@
+import logging
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Iterable, Iterator, List, Tuple
+from utils.environment import load_environment
+from utils.chunk_processing import CODE_CHUNK_MAX_TOKENS, split_code_into_chunks
+from utils.concrete_syntax_tree_parsing import (
+    FileRecord,
+    extract_file_record,
+    get_undocumented_functions,
+)
+from utils.lexical_index import tokenize_code
+from utils.instrumentation import metrics, timed
+
+# Os processos de trabalho não escrevem no log principal; erros são devolvidos
+# no resultado e registrados pelo processo pai.
+worker_logger = logging.getLogger("utils.parallel_processing.worker")
+worker_logger.propagate = False
+worker_logger.addHandler(logging.NullHandler())
+
+
+@dataclass
+class FileProcessingResult:
+    file_name: str
+    chunks: List[str] = field(default_factory=list)
+    # Termos de cada chunk para o índice léxico (BM25)
+    chunk_terms: List[List[str]] = field(default_factory=list)
+    undocumented_function_names: List[str] = field(default_factory=list)
+    undocumented_functions: List[str] = field(default_factory=list)
+    record: FileRecord | None = None
+    error: str | None = None
+
+
+def process_source_file(
+    file_name: str,
+    repo_path: str | None = None,
+    max_chunk_tokens: int = CODE_CHUNK_MAX_TOKENS,
+    keep_tree: bool = True,
+    file_content: str | None = None,
+) -> FileProcessingResult:
+    relative_name = os.path.relpath(file_name, repo_path) if repo_path else file_name
+
+    try:
+        if file_content is None:
+            with open(file_name, mode="r", encoding="utf-8") as code_file:
+                file_content = code_file.read()
+
+        # Uma única análise sintática alimenta o chunker e a busca por funções
+        # não documentadas
+        record = extract_file_record(worker_logger, file_content, file_name)
+
+        chunks = split_code_into_chunks(
+            logger=worker_logger,
+            code_content=file_content,
+            file_name=relative_name,
+            max_chunk_tokens=max_chunk_tokens,
+            record=record,
+        )
+        chunk_terms = [tokenize_code(chunk) for chunk in chunks]
+        undocumented_function_names, undocumented_functions = (
+            get_undocumented_functions(
+                worker_logger,
+                code_content=file_content,
+                file_name=file_name,
+                record=record,
+            )
+        )
+    except Exception as error:  # pylint: disable=broad-exception-caught
+        return FileProcessingResult(
+            file_name=file_name, error=f"{type(error).__name__}: {error}"
+        )
+
+    if not keep_tree:
+        # Serializar a árvore entre processos custa tanto quanto analisá-la de novo
+        record.module = None
+
+    return FileProcessingResult(
+        file_name=file_name,
+        chunks=chunks,
+        chunk_terms=chunk_terms,
+        undocumented_function_names=undocumented_function_names,
+        undocumented_functions=undocumented_functions,
+        record=record,
+    )
+
+
+def process_source_file_content(
+    file_name_and_content: Tuple[str, str], **kwargs
+) -> FileProcessingResult:
+    # executor.map passa um único argumento por item: (caminho, conteúdo)
+    file_name, file_content = file_name_and_content
+    return process_source_file(file_name, file_content=file_content, **kwargs)
+
+
+def get_number_of_workers() -> int:
+    load_environment()
+    return int(os.getenv("NUMERO_PROCESSOS", str(os.cpu_count() or 1)))
+
+
+@timed
+def process_files_in_parallel(
+    logger,
+    file_names: List[str],
+    repo_path: str | None = None,
+    max_workers: int | None = None,
+    max_chunk_tokens: int = CODE_CHUNK_MAX_TOKENS,
+    file_contents: dict[str, str] | None = None,
+) -> List[FileProcessingResult]:
+    """Processa os arquivos em paralelo; os resultados seguem a ordem dos caminhos.
+
+    ``file_contents`` traz, opcionalmente, o conteúdo já lido de cada arquivo,
+    pelo caminho; nesse caso os arquivos não são lidos de novo do disco.
+    """
+    if max_workers is None:
+        max_workers = get_number_of_workers()
+
+    # Ordem determinística, independente da ordem de listagem do sistema de arquivos
+    file_names = sorted(file_names)
+    logger.info(
+        "Processando %d arquivos com %d processo(s).", len(file_names), max_workers
+    )
+
+    if file_contents is None:
+        worker = process_source_file
+        items = file_names
+    else:
+        worker = process_source_file_content
+        items = [(file_name, file_contents[file_name]) for file_name in file_names]
+    worker = partial(worker, repo_path=repo_path, max_chunk_tokens=max_chunk_tokens)
+
+    if max_workers <= 1 or len(items) <= 1:
+        results = [worker(item) for item in items]
+    else:
+        worker = partial(worker, keep_tree=False)
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            # map preserva a ordem de entrada; chunksize reduz o custo de IPC
+            chunksize = max(1, len(items) // (max_workers * 4))
+            results = list(executor.map(worker, items, chunksize=chunksize))
+
+    failures = [result for result in results if result.error is not None]
+    # Os processos de trabalho têm métricas próprias: os totais são somados aqui
+    metrics.increment("arquivos.processados", len(results))
+    metrics.increment("arquivos.com_falha", len(failures))
+    metrics.increment("chunks.codigo", sum(len(result.chunks) for result in results))
+    for result in failures:
+        logger.error(
+            "Falha ao processar o arquivo %s: %s", result.file_name, result.error
+        )
+    logger.debug(
+        "Arquivos processados: %d; com falha: %d.", len(results), len(failures)
+    )
+
+    return results
+
+
+def iter_processed_files(
+    logger,
+    file_names: Iterable[str],
+    repo_path: str | None = None,
+    max_workers: int | None = None,
+    max_chunk_tokens: int = CODE_CHUNK_MAX_TOKENS,
+) -> Iterator[FileProcessingResult]:
+    """Processa os arquivos à medida que são listados e gera os resultados na ordem recebida.
+
+    No máximo ``2 * max_workers`` arquivos ficam em processamento ao mesmo
+    tempo; arquivos com falha são registrados e não são gerados.
+    """
+    if max_workers is None:
+        max_workers = get_number_of_workers()
+
+    worker = partial(
+        process_source_file,
+        repo_path=repo_path,
+        max_chunk_tokens=max_chunk_tokens,
+        keep_tree=False,
+    )
+
+    def check_result(result: FileProcessingResult) -> bool:
+        metrics.increment("arquivos.processados")
+        if result.error is not None:
+            metrics.increment("arquivos.com_falha")
+            logger.error(
+                "Falha ao processar o arquivo %s: %s", result.file_name, result.error
+            )
+            return False
+        metrics.increment("chunks.codigo", len(result.chunks))
+        return True
+
+    if max_workers <= 1:
+        for file_name in file_names:
+            result = worker(file_name)
+            if check_result(result):
+                yield result
+        return
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        for file_name in file_names:
+            pending.append(executor.submit(worker, file_name))
+            if len(pending) >= 2 * max_workers:
+                result = pending.popleft().result()
+                if check_result(result):
+                    yield result
+
+        while pending:
+            result = pending.popleft().result()
+            if check_result(result):
+                yield result
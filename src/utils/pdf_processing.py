@@ -1,15 +1,84 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Tuple
 import PyPDF2
+from utils.instrumentation import timed
 
 
 def extract_text_from_pdf(logger, pdf_path: str) -> str:
     logger.info("Extraindo texto do PDF: %s", pdf_path)
-    text = ""
     try:
-        with open(pdf_path, "rb") as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            for page_num in range(len(pdf_reader.pages)):
-                page = pdf_reader.pages[page_num]
-                text += page.extract_text()
+        return "".join(text for _, text in iter_pdf_pages(logger, pdf_path, 1))
     except IOError as ioerror:
         logger.error("Erro ao ler o arquivo PDF: %s", ioerror)
-    return text
+    return ""
+
+
+# Leitor do PDF aberto uma única vez em cada processo de trabalho
+worker_pdf_reader: PyPDF2.PdfReader | None = None
+
+
+def open_pdf_in_worker(pdf_path: str):
+    # Inicializador dos processos de trabalho: a tabela xref e a árvore de
+    # páginas são analisadas uma vez por processo, não uma vez por bloco
+    global worker_pdf_reader  # pylint: disable=global-statement
+    worker_pdf_reader = PyPDF2.PdfReader(pdf_path)
+
+
+def extract_pages_from_pdf(
+    pdf_reader: PyPDF2.PdfReader, first_page: int, last_page: int
+) -> List[Tuple[int, str]]:
+    return [
+        (page_num + 1, pdf_reader.pages[page_num].extract_text())
+        for page_num in range(first_page, last_page)
+    ]
+
+
+def extract_pages_in_worker(first_page: int, last_page: int) -> List[Tuple[int, str]]:
+    return extract_pages_from_pdf(worker_pdf_reader, first_page, last_page)
+
+
+@timed
+def iter_pdf_pages(
+    logger, pdf_path: str, max_workers: int | None = None, pages_per_task: int = 16
+) -> Iterator[Tuple[int, str]]:
+    """Gera (número da página, texto) na ordem do documento.
+
+    As páginas são extraídas em blocos por processos de trabalho, cada um com
+    o próprio leitor do PDF, aberto uma única vez; no máximo
+    ``2 * max_workers`` blocos ficam em andamento ao mesmo tempo, o que limita a
+    memória usada independentemente do tamanho do documento.
+    """
+    pdf_reader = PyPDF2.PdfReader(pdf_path)
+    number_of_pages = len(pdf_reader.pages)
+    logger.debug("O PDF %s possui %d páginas.", pdf_path, number_of_pages)
+
+    page_ranges = [
+        (first_page, min(first_page + pages_per_task, number_of_pages))
+        for first_page in range(0, number_of_pages, pages_per_task)
+    ]
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    if max_workers <= 1 or len(page_ranges) <= 1:
+        for first_page, last_page in page_ranges:
+            yield from extract_pages_from_pdf(pdf_reader, first_page, last_page)
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=open_pdf_in_worker,
+        initargs=(pdf_path,),
+    ) as executor:
+        pending = deque()
+        for first_page, last_page in page_ranges:
+            pending.append(
+                executor.submit(extract_pages_in_worker, first_page, last_page)
+            )
+            if len(pending) >= 2 * max_workers:
+                yield from pending.popleft().result()
+
+        while pending:
+            yield from pending.popleft().result()
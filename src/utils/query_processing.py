@@ -1,9 +1,176 @@
+import os
+import threading
 from typing import Any, List
 import faiss
-from utils.embeddings_processing import get_embedding
-from utils.indexing import search_index
+from utils.environment import load_environment
+from utils.completion_cache import (
+    CompletionCache,
+    get_chunk_id,
+    get_completion_key,
+)
+from utils.context_building import (
+    ContextSettings,
+    build_context,
+    filter_indices_by_distance,
+)
+from utils.embedding_cache import EmbeddingCache, QueryEmbeddingCache
+from utils.embeddings_processing import (
+    create_embeddings,
+    get_embedder,
+    get_embedding,
+)
+from utils.indexing import search_index, search_index_batch
+from utils.lexical_index import LexicalIndex, reciprocal_rank_fusion
+from utils.instrumentation import measure, metrics, timed
 
+# Caches compartilhados pelas perguntas feitas durante a execução do processo
+default_query_cache: QueryEmbeddingCache | None = None
+default_completion_cache: CompletionCache | None = None
+# Várias threads (servidor de consultas, geração em lote) podem pedir o cache
+# pela primeira vez ao mesmo tempo; só uma delas o cria
+default_query_cache_lock = threading.Lock()
+default_completion_cache_lock = threading.Lock()
 
+
+def get_query_embedding_cache(logger) -> QueryEmbeddingCache:
+    global default_query_cache  # pylint: disable=global-statement
+
+    if default_query_cache is None:
+        with default_query_cache_lock:
+            if default_query_cache is None:
+                load_environment()
+                capacity = int(os.getenv("QUERY_CACHE_CAPACIDADE", "1024"))
+                disk_cache = None
+                disk_cache_file = os.getenv("QUERY_CACHE_ARQUIVO")
+                if disk_cache_file:
+                    disk_cache = EmbeddingCache(logger, cache_file=disk_cache_file)
+                default_query_cache = QueryEmbeddingCache(
+                    capacity, disk_cache=disk_cache
+                )
+
+    return default_query_cache
+
+
+def get_completion_cache(logger) -> CompletionCache:
+    global default_completion_cache  # pylint: disable=global-statement
+
+    if default_completion_cache is None:
+        with default_completion_cache_lock:
+            if default_completion_cache is None:
+                load_environment()
+                default_completion_cache = CompletionCache(
+                    logger,
+                    cache_file=os.getenv(
+                        "COMPLETION_CACHE_ARQUIVO", "completions_cache.sqlite"
+                    ),
+                    ttl_seconds=float(
+                        os.getenv("COMPLETION_CACHE_TTL", str(7 * 24 * 3600))
+                    ),
+                    max_entries=int(
+                        os.getenv("COMPLETION_CACHE_MAX_ENTRIES", "100000")
+                    ),
+                )
+
+    return default_completion_cache
+
+
+def is_completion_cache_bypassed() -> bool:
+    load_environment()
+    return os.getenv("COMPLETION_CACHE_DESATIVADO", "false").lower() in (
+        "1",
+        "true",
+        "sim",
+    )
+
+
+@timed
+def get_query_embedding(
+    logger,
+    query: str,
+    client,
+    model: str = "text-embedding-3-small",
+    query_cache: QueryEmbeddingCache | None = None,
+) -> List[float]:
+    if query_cache is None:
+        query_cache = get_query_embedding_cache(logger)
+
+    embedder = get_embedder(logger, client, model)
+
+    (query_embedding,) = query_cache.get_many(
+        embedder.name, [query], embedder.dimension
+    )
+    if query_embedding is not None:
+        logger.debug("Embedding da pergunta obtido do cache.")
+        return query_embedding
+
+    query_embedding = get_embedding(logger, query, client, model, embedder=embedder)
+    query_cache.put_many(embedder.name, [query], [query_embedding], embedder.dimension)
+    return query_embedding
+
+
+def rank_chunk_ids(
+    query: str,
+    dense_ids: List[int],
+    lexical_index: LexicalIndex | None,
+    k: int,
+) -> List[int]:
+    if lexical_index is None:
+        return dense_ids
+
+    # Identificadores exatos (nomes de funções, atributos, imports) pesam na
+    # busca léxica; os dois rankings são combinados por posição recíproca
+    lexical_ids, _ = lexical_index.search(query, k)
+    return reciprocal_rank_fusion([dense_ids, lexical_ids.tolist()], k)
+
+
+@timed
+def retrieve_chunks_for_queries(
+    logger,
+    queries: List[str],
+    index: faiss.Index,
+    chunks: List[str],
+    client,
+    k: int = 5,
+    query_cache: QueryEmbeddingCache | None = None,
+    context_settings: ContextSettings | None = None,
+    lexical_index: LexicalIndex | None = None,
+) -> List[List[str]]:
+    logger.info("Recuperando chunks relevantes para %d consultas.", len(queries))
+
+    if query_cache is None:
+        query_cache = get_query_embedding_cache(logger)
+    query_embeddings = create_embeddings(logger, queries, client, cache=query_cache)
+
+    # Consultas cujo embedding falhou ficam sem contexto
+    valid_positions = [
+        position
+        for position, query_embedding in enumerate(query_embeddings)
+        if len(query_embedding) > 0
+    ]
+    dense_ids: List[List[int]] = [[] for _ in queries]
+
+    if context_settings is None:
+        context_settings = ContextSettings.from_environment()
+
+    if len(valid_positions) > 0:
+        indices, distances = search_index_batch(
+            logger,
+            index,
+            [query_embeddings[position] for position in valid_positions],
+            k,
+        )
+        for row, position in enumerate(valid_positions):
+            dense_ids[position] = filter_indices_by_distance(
+                indices[row], distances[row], context_settings.max_distance
+            )
+
+    return [
+        [chunks[i] for i in rank_chunk_ids(query, query_dense_ids, lexical_index, k)]
+        for query, query_dense_ids in zip(queries, dense_ids)
+    ]
+
+
+@timed
 def answer_query(
     logger,
     query: str,
@@ -12,41 +179,89 @@ def answer_query(
     system_prompt: str,
     client,
     k: int = 5,
+    relevant_chunks: List[str] | None = None,
+    query_cache: QueryEmbeddingCache | None = None,
+    completion_cache: CompletionCache | None = None,
+    bypass_completion_cache: bool | None = None,
+    context_settings: ContextSettings | None = None,
+    lexical_index: LexicalIndex | None = None,
 ) -> str:
     logger.info("Respondendo à pergunta do usuário.")
-    query_embedding = get_embedding(logger, query, client)
-    logger.debug("Query_embedding: %s", query_embedding)
 
-    indices, distances = search_index(  # pylint: disable=unused-variable
-        logger, index, query_embedding, k
-    )
+    if context_settings is None:
+        context_settings = ContextSettings.from_environment()
+
+    # Os chunks podem ter sido recuperados previamente em lote
+    # (ver retrieve_chunks_for_queries)
+    if relevant_chunks is None:
+        query_embedding = get_query_embedding(
+            logger, query, client, query_cache=query_cache
+        )
+        logger.debug("Query_embedding: %s", query_embedding)
+
+        indices, distances = search_index(logger, index, query_embedding, k)
 
-    logger.debug("Indices: %s", indices)
+        logger.debug("Indices: %s", indices)
+        logger.debug("Distâncias: %s", distances)
 
-    relevant_chunks = [chunks[i] for i in indices]
+        dense_ids = filter_indices_by_distance(
+            indices, distances, context_settings.max_distance
+        )
+        relevant_chunks = [
+            chunks[i] for i in rank_chunk_ids(query, dense_ids, lexical_index, k)
+        ]
 
     logger.warning("Chunks relevants\n")
     for contador, chunk in enumerate(relevant_chunks):
         logger.debug("Chunk relevante #%d: %s\n\n", contador, chunk)
 
-    context = "\n\n".join(relevant_chunks)
+    model = "gpt-4o-mini"
+
+    context_chunks, context = build_context(
+        logger, relevant_chunks, context_settings, model
+    )
+
+    if completion_cache is None:
+        completion_cache = get_completion_cache(logger)
+    if bypass_completion_cache is None:
+        bypass_completion_cache = is_completion_cache_bypassed()
+
+    completion_key = get_completion_key(
+        model,
+        system_prompt,
+        [get_chunk_id(chunk) for chunk in context_chunks],
+        query,
+    )
+    # Com o cache ignorado, a resposta nova ainda substitui a armazenada
+    if not bypass_completion_cache:
+        cached_answer = completion_cache.get(completion_key)
+        if cached_answer is not None:
+            metrics.increment("llm.respostas_do_cache")
+            logger.debug("Resposta obtida do cache: %s", cached_answer)
+            return cached_answer
 
     try:
         logger.debug("Contexto:\n%s", context)
         logger.debug("Query:\n%s", query)
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "system", "content": "Contexto:\n{context}\n\n"},
-                {"role": "user", "content": f"Pergunta: {query}"},
-            ],
-            temperature=1,
-        )
+        with measure("query_processing.chat_completion"):
+            response = client.chat.completions.create(
+                model=model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "system", "content": f"Contexto:\n{context}\n\n"},
+                    {"role": "user", "content": f"Pergunta: {query}"},
+                ],
+                temperature=1,
+            )
+        metrics.increment("llm.requisicoes")
+        metrics.record_usage("chat", getattr(response, "usage", None))
         answer = response.choices[0].message.content
         logger.debug("Resposta da LLM: %s", answer)
+        if answer is not None:
+            completion_cache.put(completion_key, answer)
         return answer
 
     except IOError as ioerror:
+        metrics.increment("llm.falhas")
         logger.error("Erro ao gerar a resposta: %s", ioerror)
         return "Desculpe, ocorreu um erro ao gerar a resposta."
@@ -0,0 +1,253 @@
+import json
+import os
+import socketserver
+import time
+from dataclasses import dataclass
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+from utils.environment import load_environment
+from utils.context_building import ContextSettings
+from utils.instrumentation import measure, metrics
+from utils.query_processing import answer_query, retrieve_chunks_for_queries
+
+DEFAULT_SYSTEM_PROMPT = (
+    "Você é um assistente de geração de documentação de códigos em Python."
+)
+
+
+@dataclass
+class ServerSettings:
+    """Endereço do servidor de consultas.
+
+    Quando ``socket_path`` é definido, o servidor escuta nesse socket Unix em
+    vez de ``host``:``port``.
+    """
+
+    host: str = "127.0.0.1"
+    port: int = 8765
+    socket_path: str | None = None
+    corpus: str = "codigo"
+    max_body_bytes: int = 1_000_000
+
+    @classmethod
+    def from_environment(cls) -> "ServerSettings":
+        load_environment()
+        return cls(
+            host=os.getenv("SERVIDOR_HOST", "127.0.0.1"),
+            port=int(os.getenv("SERVIDOR_PORTA", "8765")),
+            socket_path=os.getenv("SERVIDOR_SOCKET") or None,
+            corpus=os.getenv("SERVIDOR_CORPUS", "codigo").lower(),
+            max_body_bytes=int(os.getenv("SERVIDOR_MAX_BYTES_REQUISICAO", "1000000")),
+        )
+
+
+class RequestError(Exception):
+    """Requisição inválida; a mensagem é devolvida ao cliente com o status 400."""
+
+
+class QueryService:
+    """Cliente, índice e chunks carregados uma única vez e compartilhados pelas requisições.
+
+    As buscas no FAISS e os caches de perguntas e respostas podem ser usados
+    por várias threads ao mesmo tempo.
+    """
+
+    def __init__(
+        self,
+        logger,
+        client,
+        index,
+        chunks,
+        lexical_index=None,
+        system_prompt: str = DEFAULT_SYSTEM_PROMPT,
+        context_settings: ContextSettings | None = None,
+    ):
+        self.logger = logger
+        self.client = client
+        self.index = index
+        self.chunks = chunks
+        self.lexical_index = lexical_index
+        self.system_prompt = system_prompt
+        self.context_settings = context_settings or ContextSettings.from_environment()
+        self.started = time.time()
+
+    def health(self) -> dict:
+        return {
+            "status": "ok",
+            "vetores": int(self.index.ntotal),
+            "chunks": len(self.chunks),
+            "busca_hibrida": self.lexical_index is not None,
+            "tempo_ativo_s": round(time.time() - self.started, 3),
+        }
+
+    def retrieve(self, payload: dict) -> dict:
+        queries = payload.get("perguntas")
+        if queries is None and "pergunta" in payload:
+            queries = [payload["pergunta"]]
+        queries = require_strings(queries, "perguntas")
+
+        relevant_chunks = retrieve_chunks_for_queries(
+            logger=self.logger,
+            queries=queries,
+            index=self.index,
+            chunks=self.chunks,
+            client=self.client,
+            k=get_k(payload),
+            context_settings=self.context_settings,
+            lexical_index=self.lexical_index,
+        )
+        return {"chunks": relevant_chunks}
+
+    def answer(self, payload: dict) -> dict:
+        (query,) = require_strings([payload.get("pergunta")], "pergunta")
+        system_prompt = payload.get("prompt_sistema", self.system_prompt)
+        if not isinstance(system_prompt, str):
+            raise RequestError("O campo prompt_sistema deve ser um texto.")
+
+        answer = answer_query(
+            logger=self.logger,
+            query=query,
+            index=self.index,
+            chunks=self.chunks,
+            system_prompt=system_prompt,
+            client=self.client,
+            k=get_k(payload),
+            context_settings=self.context_settings,
+            lexical_index=self.lexical_index,
+        )
+        return {"resposta": answer}
+
+
+def require_strings(values, field: str) -> List[str]:
+    if (
+        not isinstance(values, list)
+        or len(values) == 0
+        or not all(isinstance(value, str) and value.strip() for value in values)
+    ):
+        raise RequestError(f"O campo {field} é obrigatório e deve conter textos.")
+    return values
+
+
+def get_k(payload: dict) -> int:
+    k = payload.get("k", 5)
+    if not isinstance(k, int) or isinstance(k, bool) or k < 1 or k > 100:
+        raise RequestError("O campo k deve ser um inteiro entre 1 e 100.")
+    return k
+
+
+class QueryRequestHandler(BaseHTTPRequestHandler):
+    """Rotas do servidor de consultas; o corpo das requisições e respostas é JSON.
+
+    GET /health e GET /metrics; POST /retrieve com ``perguntas`` (ou
+    ``pergunta``) e ``k``; POST /answer com ``pergunta``, ``k`` e,
+    opcionalmente, ``prompt_sistema``.
+    """
+
+    # Conexões persistentes evitam um novo handshake a cada consulta
+    protocol_version = "HTTP/1.1"
+    service: QueryService
+    max_body_bytes: int = 1_000_000
+
+    def address_string(self) -> str:
+        # Em sockets Unix o endereço do cliente é vazio
+        return self.client_address[0] if self.client_address else "socket-unix"
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        self.service.logger.debug(
+            "Servidor: %s - %s", self.address_string(), format % args
+        )
+
+    def send_json(self, status: HTTPStatus, body: dict):
+        content = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > self.max_body_bytes:
+            raise RequestError(
+                f"Corpo da requisição maior que {self.max_body_bytes} bytes."
+            )
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except (UnicodeDecodeError, json.JSONDecodeError) as error:
+            raise RequestError(f"JSON inválido: {error}") from error
+        if not isinstance(payload, dict):
+            raise RequestError("O corpo da requisição deve ser um objeto JSON.")
+        return payload
+
+    def handle_route(self, routes: dict):
+        route = self.path.split("?", 1)[0]
+        handler = routes.get(route)
+        if handler is None:
+            # O corpo não lido impediria reaproveitar a conexão
+            self.close_connection = True
+            self.send_json(
+                HTTPStatus.NOT_FOUND, {"erro": f"Rota desconhecida: {route}"}
+            )
+            return
+
+        metrics.increment(f"servidor.requisicoes{route.replace('/', '.')}")
+        try:
+            with measure(f"query_server{route.replace('/', '.')}"):
+                body = handler()
+        except RequestError as error:
+            metrics.increment("servidor.requisicoes_invalidas")
+            self.close_connection = True
+            self.send_json(HTTPStatus.BAD_REQUEST, {"erro": str(error)})
+            return
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            metrics.increment("servidor.falhas")
+            self.service.logger.exception("Erro ao atender %s: %s", route, error)
+            self.send_json(
+                HTTPStatus.INTERNAL_SERVER_ERROR,
+                {"erro": f"{type(error).__name__}: {error}"},
+            )
+            return
+
+        self.send_json(HTTPStatus.OK, body)
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        self.handle_route(
+            {
+                "/health": self.service.health,
+                "/metrics": metrics.summary,
+            }
+        )
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        self.handle_route(
+            {
+                "/retrieve": lambda: self.service.retrieve(self.read_json()),
+                "/answer": lambda: self.service.answer(self.read_json()),
+            }
+        )
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+def create_server(
+    service: QueryService, settings: ServerSettings
+) -> socketserver.BaseServer:
+    handler = type(
+        "BoundQueryRequestHandler",
+        (QueryRequestHandler,),
+        {"service": service, "max_body_bytes": settings.max_body_bytes},
+    )
+
+    if settings.socket_path:
+        if os.path.exists(settings.socket_path):
+            # Socket deixado por uma execução anterior
+            os.remove(settings.socket_path)
+        return ThreadingUnixHTTPServer(settings.socket_path, handler)
+
+    # Cabeçalhos e corpo saem em escritas separadas: com o algoritmo de Nagle,
+    # cada resposta esperaria o ACK atrasado do cliente (~40 ms)
+    handler.disable_nagle_algorithm = True
+    return ThreadingHTTPServer((settings.host, settings.port), handler)
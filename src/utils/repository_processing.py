@@ -1,36 +1,284 @@
+import fnmatch
 import os
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, List, Tuple
+from utils.environment import load_environment
+from utils.instrumentation import metrics, timed
 
-from openai.types import file_content
+# Pastas que nunca contêm código do projeto: controle de versão, ambientes
+# virtuais, dependências, caches e resultados de build. Nomes comuns também
+# em pacotes do projeto (env, build, dist) só são excluídos na raiz.
+DEFAULT_EXCLUDE_PATTERNS = [
+    ".git/",
+    ".hg/",
+    ".svn/",
+    "__pycache__/",
+    ".venv/",
+    "venv/",
+    "/env/",
+    "node_modules/",
+    "site-packages/",
+    ".tox/",
+    ".nox/",
+    ".mypy_cache/",
+    ".pytest_cache/",
+    ".ruff_cache/",
+    "/build/",
+    "/dist/",
+    "*.egg-info/",
+]
 
+# Arquivos maiores que isso costumam ser gerados automaticamente
+DEFAULT_MAX_FILE_SIZE = 1_000_000
 
-def extract_source_code_from_repository(logger, repo_path):
 
-    code_file_contents: list[str] = []
-    file_names: list[str] = get_all_python_files_from_repository(logger, repo_path)
+# Repositórios de código configurados como REPOSITORY_1_PATH, REPOSITORY_2_PATH...
+REPOSITORY_PATH_VARIABLE = re.compile(r"^REPOSITORY_(\d+)_PATH$")
 
-    files_processed = 0
-    for file_name in file_names:
 
-        with open(file_name, mode="r", encoding="utf-8") as code_file:
-            file_content = code_file.read()
-            code_file_contents.append(file_content)
+@dataclass
+class CodeRepository:
+    """Repositório de código com o próprio shard de índice e de chunks."""
 
-        # TODO: Para remover depois
-        if files_processed == 5:
-            break
+    number: int
+    path: str
+
+    @property
+    def artifact_suffix(self) -> str:
+        # O primeiro repositório mantém os nomes de arquivo de antes dos shards
+        return "_code" if self.number == 1 else f"_code_{self.number}"
+
+
+def get_code_repositories() -> List[CodeRepository]:
+    load_environment()
+    repositories = [
+        CodeRepository(int(match.group(1)), path)
+        for match, path in (
+            (REPOSITORY_PATH_VARIABLE.match(name), value)
+            for name, value in os.environ.items()
+        )
+        if match is not None and path.strip()
+    ]
+    return sorted(repositories, key=lambda repository: repository.number)
+
+
+@dataclass
+class IgnoreRule:
+    pattern: str
+    negated: bool = False
+    directory_only: bool = False
+    anchored: bool = False
+
+    def __post_init__(self):
+        self.match = re.compile(fnmatch.translate(self.pattern)).match
+
+    def matches(self, relative_path: str, is_directory: bool) -> bool:
+        if self.directory_only and not is_directory:
+            return False
+        if self.anchored:
+            return self.match(relative_path) is not None
+        return self.match(relative_path.rsplit("/", 1)[-1]) is not None
+
+
+def parse_ignore_pattern(line: str) -> IgnoreRule | None:
+    line = line.strip()
+    if len(line) == 0 or line.startswith("#"):
+        return None
+
+    negated = line.startswith("!")
+    if negated:
+        line = line[1:]
+    directory_only = line.endswith("/")
+    line = line.rstrip("/")
+    # Como no .gitignore, padrões com "/" no início ou no meio são relativos à raiz
+    anchored = "/" in line
+    line = line.lstrip("/")
+    if line.startswith("**/"):
+        line = line[3:]
+        anchored = "/" in line
+
+    return IgnoreRule(line, negated, directory_only, anchored)
+
+
+@dataclass
+class IgnoreRules:
+    """Regras de exclusão no estilo do ``.gitignore``; a última regra aplicável vence."""
+
+    rules: List[IgnoreRule] = field(default_factory=list)
+
+    @classmethod
+    def from_patterns(cls, patterns: Iterable[str]) -> "IgnoreRules":
+        rules = [parse_ignore_pattern(pattern) for pattern in patterns]
+        return cls([rule for rule in rules if rule is not None])
+
+    def is_ignored(self, relative_path: str, is_directory: bool) -> bool:
+        for rule in reversed(self.rules):
+            if rule.matches(relative_path, is_directory):
+                return not rule.negated
+        return False
+
+
+def get_ignore_rules(
+    logger, repo_path: str, exclude_patterns: List[str] | None = None
+) -> IgnoreRules:
+    load_environment()
+    patterns = list(DEFAULT_EXCLUDE_PATTERNS)
+
+    use_gitignore = os.getenv("REPOSITORIO_USAR_GITIGNORE", "true").lower() in (
+        "1",
+        "true",
+        "sim",
+    )
+    gitignore_file = os.path.join(repo_path, ".gitignore")
+    if use_gitignore and os.path.isfile(gitignore_file):
+        with open(gitignore_file, mode="r", encoding="utf-8") as f:
+            patterns.extend(f.read().splitlines())
+        logger.debug("Padrões de exclusão lidos de %s", gitignore_file)
+
+    if exclude_patterns is None:
+        exclude_patterns = [
+            pattern.strip()
+            for pattern in os.getenv("REPOSITORIO_PADROES_EXCLUIDOS", "").split(",")
+            if pattern.strip()
+        ]
+    patterns.extend(exclude_patterns)
+
+    return IgnoreRules.from_patterns(patterns)
 
-    return code_file_contents, file_names
+
+def get_max_file_size() -> int:
+    load_environment()
+    return int(
+        os.getenv("REPOSITORIO_TAMANHO_MAXIMO_ARQUIVO", str(DEFAULT_MAX_FILE_SIZE))
+    )
+
+
+@timed
+def iter_python_files(
+    logger,
+    repo_path: str,
+    exclude_patterns: List[str] | None = None,
+    max_file_size: int | None = None,
+) -> Iterator[str]:
+    """Gera os caminhos dos arquivos ``.py`` do repositório, pasta a pasta.
+
+    A ordem é determinística: em cada pasta, primeiro os arquivos e depois as
+    subpastas, ambos em ordem alfabética.
+
+    Pastas excluídas não são percorridas. Arquivos acima de ``max_file_size``
+    bytes são ignorados, assim como links simbólicos para pastas.
+    """
+    ignore_rules = get_ignore_rules(logger, repo_path, exclude_patterns)
+    if max_file_size is None:
+        max_file_size = get_max_file_size()
+
+    skipped_files = 0
+    pending_directories = [(repo_path, "")]
+    while pending_directories:
+        directory, relative_directory = pending_directories.pop()
+        try:
+            with os.scandir(directory) as entries:
+                entries = sorted(entries, key=lambda entry: entry.name)
+        except OSError as error:
+            logger.warning("Não foi possível listar a pasta %s: %s", directory, error)
+            continue
+
+        subdirectories = []
+        for entry in entries:
+            relative_path = relative_directory + entry.name
+            if entry.is_dir(follow_symlinks=False):
+                if not ignore_rules.is_ignored(relative_path, True):
+                    subdirectories.append((entry.path, relative_path + "/"))
+                continue
+
+            if not entry.name.endswith(".py") or ignore_rules.is_ignored(
+                relative_path, False
+            ):
+                continue
+            try:
+                file_size = entry.stat().st_size
+            except OSError as error:
+                # Link simbólico quebrado ou arquivo removido durante a varredura
+                logger.warning(
+                    "Não foi possível ler o arquivo %s: %s", entry.path, error
+                )
+                continue
+            if file_size > max_file_size:
+                skipped_files += 1
+                logger.debug("Arquivo ignorado por exceder o tamanho: %s", entry.path)
+                continue
+
+            metrics.increment("repositorio.arquivos_python")
+            yield entry.path
+
+        # A pilha é desempilhada do fim: empilhar ao contrário mantém a ordem
+        pending_directories.extend(reversed(subdirectories))
+
+    if skipped_files > 0:
+        logger.info(
+            "%d arquivos maiores que %d bytes foram ignorados.",
+            skipped_files,
+            max_file_size,
+        )
 
 
 def get_all_python_files_from_repository(logger, repo_path):
+    return list(iter_python_files(logger, repo_path))
+
 
+def read_source_file(file_name: str) -> str:
+    with open(file_name, mode="r", encoding="utf-8") as code_file:
+        return code_file.read()
+
+
+def iter_file_contents(
+    logger, file_names: Iterable[str], max_workers: int = 8
+) -> Iterator[Tuple[str, str]]:
+    """Lê os arquivos em uma pool de threads e gera (caminho, conteúdo) na ordem recebida.
+
+    No máximo ``2 * max_workers`` leituras ficam em andamento ao mesmo tempo;
+    arquivos que não podem ser lidos são registrados e ignorados.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+
+        def next_result():
+            file_name, future = pending.popleft()
+            try:
+                return file_name, future.result()
+            except (OSError, UnicodeDecodeError) as error:
+                logger.error("Erro ao ler o arquivo %s: %s", file_name, error)
+                return file_name, None
+
+        for file_name in file_names:
+            pending.append((file_name, executor.submit(read_source_file, file_name)))
+            if len(pending) >= 2 * max_workers:
+                file_name, file_content = next_result()
+                if file_content is not None:
+                    yield file_name, file_content
+
+        while pending:
+            file_name, file_content = next_result()
+            if file_content is not None:
+                yield file_name, file_content
+
+
+def extract_source_code_from_repository(
+    logger, repo_path, max_files: int | None = None
+):
+    code_file_contents: list[str] = []
     file_names: list[str] = []
-    for dirpath, dirnames, filenames in os.walk(repo_path):
 
-        for filename in filenames:
+    for file_name, file_content in iter_file_contents(
+        logger, iter_python_files(logger, repo_path)
+    ):
+        code_file_contents.append(file_content)
+        file_names.append(file_name)
 
-            if filename.endswith(".py"):
-                fullpath = os.path.join(dirpath, filename)
-                file_names.append(fullpath)
+        if max_files is not None and len(file_names) >= max_files:
+            break
 
-    return file_names
+    return code_file_contents, file_names
@@ -0,0 +1,265 @@
+import os
+import shutil
+from collections.abc import Sequence
+from typing import List
+import faiss
+import numpy as np
+from utils.indexing import split_global_id
+
+# Leitura do índice FAISS mapeada em memória. IO_FLAG_MMAP cobre as listas
+# invertidas dos índices IVF; IO_FLAG_MMAP_IFC (faiss >= 1.11) cobre os
+# códigos dos índices planos.
+FAISS_MMAP_FLAGS = (
+    faiss.IO_FLAG_MMAP | getattr(faiss, "IO_FLAG_MMAP_IFC", 0) | faiss.IO_FLAG_READ_ONLY
+)
+
+
+class MappedChunks(Sequence):
+    """Chunks de texto armazenados em um único blob UTF-8 mapeado em memória.
+
+    O chunk ``i`` ocupa os bytes ``offsets[i]:offsets[i + 1]`` do blob e só é
+    decodificado quando acessado.
+    """
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(len(self)))]
+
+        position = int(position)
+        if position < 0:
+            position += len(self)
+        if position < 0 or position >= len(self):
+            raise IndexError("Posição de chunk fora do intervalo")
+
+        start = self.offsets[position]
+        end = self.offsets[position + 1]
+        return bytes(self.blob[start:end]).decode("utf-8")
+
+
+class ShardedChunks:
+    """Chunks de vários shards acessados pelos identificadores globais do ``ShardedIndex``."""
+
+    def __init__(self, shards: dict[int, Sequence | dict]):
+        self.shards = shards
+
+    def __len__(self) -> int:
+        return sum(len(chunks) for chunks in self.shards.values())
+
+    def __getitem__(self, global_id) -> str:
+        shard_number, chunk_id = split_global_id(global_id)
+        return self.shards[shard_number][chunk_id]
+
+
+def check_index_can_be_stored(index: faiss.Index):
+    # Um índice sem dimensão gravado em disco faria as buscas do shard falharem
+    if index.d == 0:
+        raise ValueError("Índice FAISS sem dimensão não pode ser gravado.")
+
+
+def save_embeddings_mmap(
+    logger,
+    embeddings: List[List[float]],
+    chunks: List[str],
+    index: faiss.Index,
+    embeddings_file: str = "embeddings.npy",
+    chunks_file: str = "chunks.bin",
+    offsets_file: str = "chunks_offsets.npy",
+    index_file: str = "faiss.index",
+):
+    logger.info("Salvando embeddings, chunks e índice no disco (formato mmap).")
+
+    np.save(embeddings_file, np.asarray(embeddings, dtype=np.float32))
+
+    offsets = np.zeros(len(chunks) + 1, dtype=np.int64)
+    with open(chunks_file, "wb") as f:
+        for position, chunk in enumerate(chunks):
+            encoded_chunk = chunk.encode("utf-8")
+            f.write(encoded_chunk)
+            offsets[position + 1] = offsets[position] + len(encoded_chunk)
+    np.save(offsets_file, offsets)
+
+    faiss.write_index(index, index_file)
+
+
+def read_index_mmap(index_file: str) -> faiss.Index:
+    try:
+        return faiss.read_index(index_file, FAISS_MMAP_FLAGS)
+    except RuntimeError:
+        # Índices IVF com as listas em memória não aceitam IO_FLAG_MMAP_IFC
+        return faiss.read_index(
+            index_file, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+        )
+
+
+def load_embeddings_mmap(
+    logger,
+    embeddings_file: str = "embeddings.npy",
+    chunks_file: str = "chunks.bin",
+    offsets_file: str = "chunks_offsets.npy",
+    index_file: str = "faiss.index",
+) -> tuple[np.ndarray, MappedChunks, faiss.Index]:
+    if (
+        os.path.exists(embeddings_file)
+        and os.path.exists(chunks_file)
+        and os.path.exists(offsets_file)
+        and os.path.exists(index_file)
+    ):
+        logger.info("Mapeando em memória embeddings, chunks e índice do disco.")
+        embeddings = np.load(embeddings_file, mmap_mode="r")
+        offsets = np.load(offsets_file, mmap_mode="r")
+        if os.path.getsize(chunks_file) > 0:
+            blob = np.memmap(chunks_file, dtype=np.uint8, mode="r")
+        else:
+            # np.memmap não aceita arquivos vazios
+            blob = np.zeros(0, dtype=np.uint8)
+        index = read_index_mmap(index_file)
+        return embeddings, MappedChunks(blob, offsets), index
+
+    logger.warning("Arquivos de embeddings (formato mmap) não encontrados.")
+    embeddings = np.zeros((0, 0), dtype=np.float32)
+    chunks = MappedChunks(np.zeros(0, dtype=np.uint8), np.zeros(1, dtype=np.int64))
+    index = faiss.IndexFlatL2()
+    return embeddings, chunks, index
+
+
+def save_chunk_pages(
+    logger, chunk_pages: List[int], pages_file: str = "chunk_pages.npy"
+):
+    logger.debug("Salvando as páginas de origem de %d chunks.", len(chunk_pages))
+    np.save(pages_file, np.asarray(chunk_pages, dtype=np.int32))
+
+
+def load_chunk_pages(logger, pages_file: str = "chunk_pages.npy") -> np.ndarray:
+    if os.path.exists(pages_file):
+        return np.load(pages_file, mmap_mode="r")
+
+    logger.warning("Arquivo de páginas dos chunks %s não encontrado.", pages_file)
+    return np.zeros(0, dtype=np.int32)
+
+
+# Sufixo dos arquivos ainda em construção pela ingestão em streaming
+PARTIAL_SUFFIX = ".parcial"
+
+
+class NpyStreamWriter:
+    """Grava uma matriz ``.npy`` em blocos de linhas, sem conhecer o total de antemão.
+
+    As linhas vão para um arquivo de dados brutos; ``finish`` escreve o
+    cabeçalho com o formato final seguido dos dados.
+    """
+
+    def __init__(self, file_name: str, dtype):
+        self.file_name = file_name
+        self.dtype = np.dtype(dtype)
+        self.row_shape: tuple | None = None
+        self.rows = 0
+        self.data_file_name = f"{file_name}.dados{PARTIAL_SUFFIX}"
+        self.data_file = open(  # pylint: disable=consider-using-with
+            self.data_file_name, "wb"
+        )
+
+    def append(self, rows: np.ndarray):
+        rows = np.ascontiguousarray(rows, dtype=self.dtype)
+        if self.row_shape is None:
+            self.row_shape = rows.shape[1:]
+        elif rows.shape[1:] != self.row_shape:
+            raise ValueError(
+                f"Linhas com formato {rows.shape[1:]} em uma matriz de linhas {self.row_shape}"
+            )
+        self.data_file.write(rows.tobytes())
+        self.rows += len(rows)
+
+    def finish(self, destination: str):
+        self.data_file.close()
+        row_shape = self.row_shape if self.row_shape is not None else (0,)
+        with open(destination, "wb") as f:
+            np.lib.format.write_array_header_1_0(
+                f,
+                {
+                    "descr": np.lib.format.dtype_to_descr(self.dtype),
+                    "fortran_order": False,
+                    "shape": (self.rows,) + tuple(row_shape),
+                },
+            )
+            with open(self.data_file_name, "rb") as data_file:
+                shutil.copyfileobj(data_file, f)
+        os.remove(self.data_file_name)
+
+    def discard(self):
+        self.data_file.close()
+        if os.path.exists(self.data_file_name):
+            os.remove(self.data_file_name)
+
+
+class MmapArtifactsWriter:
+    """Grava embeddings, chunks e offsets do formato mmap à medida que os lotes chegam.
+
+    Tudo é escrito em arquivos ``.parcial``, renomeados apenas em ``finish``:
+    uma ingestão interrompida não deixa artefatos incompletos para a próxima
+    carga.
+    """
+
+    def __init__(
+        self,
+        embeddings_file: str = "embeddings.npy",
+        chunks_file: str = "chunks.bin",
+        offsets_file: str = "chunks_offsets.npy",
+        index_file: str = "faiss.index",
+    ):
+        self.files = [embeddings_file, chunks_file, offsets_file, index_file]
+        self.embeddings = NpyStreamWriter(embeddings_file, np.float32)
+        self.offsets = NpyStreamWriter(offsets_file, np.int64)
+        self.offsets.append(np.zeros(1, dtype=np.int64))
+        self.chunks_file = open(  # pylint: disable=consider-using-with
+            chunks_file + PARTIAL_SUFFIX, "wb"
+        )
+        self.chunk_bytes = 0
+
+    def __len__(self) -> int:
+        return self.embeddings.rows
+
+    def append(self, embeddings: np.ndarray, chunks: List[str]):
+        offsets = np.zeros(len(chunks), dtype=np.int64)
+        for position, chunk in enumerate(chunks):
+            encoded_chunk = chunk.encode("utf-8")
+            self.chunks_file.write(encoded_chunk)
+            self.chunk_bytes += len(encoded_chunk)
+            offsets[position] = self.chunk_bytes
+
+        self.embeddings.append(embeddings)
+        self.offsets.append(offsets)
+
+    def finish(self, logger, index: faiss.Index):
+        check_index_can_be_stored(index)
+        embeddings_file, _, offsets_file, index_file = self.files
+        logger.info(
+            "Salvando %d embeddings, chunks e índice no disco (formato mmap).",
+            len(self),
+        )
+
+        self.chunks_file.close()
+        self.embeddings.finish(embeddings_file + PARTIAL_SUFFIX)
+        self.offsets.finish(offsets_file + PARTIAL_SUFFIX)
+        faiss.write_index(index, index_file + PARTIAL_SUFFIX)
+
+        # Sem o índice a carga ignora os demais arquivos: o antigo é removido
+        # antes e o novo é renomeado por último, para nunca misturar execuções
+        if os.path.exists(index_file):
+            os.remove(index_file)
+        for file_name in self.files:
+            os.replace(file_name + PARTIAL_SUFFIX, file_name)
+
+    def discard(self):
+        self.chunks_file.close()
+        self.embeddings.discard()
+        self.offsets.discard()
+        for file_name in self.files:
+            if os.path.exists(file_name + PARTIAL_SUFFIX):
+                os.remove(file_name + PARTIAL_SUFFIX)
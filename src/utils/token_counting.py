@@ -0,0 +1,61 @@
+import logging
+import math
+from functools import lru_cache
+from typing import List
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - ambiente sem as dependências do projeto
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# Aproximação usada quando a codificação do tiktoken não está disponível.
+# Código e textos em português ficam abaixo dos ~4 caracteres por token do
+# inglês; um valor menor superestima os tokens e mantém os chunks no limite.
+CHARS_PER_TOKEN = 2.5
+
+
+@lru_cache(maxsize=8)
+def _get_encoding(model: str):
+    if tiktoken is None:
+        logger.warning(
+            "tiktoken não instalado: tokens estimados em %.1f caracteres por token.",
+            CHARS_PER_TOKEN,
+        )
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except Exception as error:  # pylint: disable=broad-exception-caught
+        # Modelo desconhecido ou arquivo de codificação indisponível (sem rede)
+        logger.warning(
+            "Codificação do tiktoken indisponível para o modelo %s (%s): tokens "
+            "estimados em %.1f caracteres por token.",
+            model,
+            error,
+            CHARS_PER_TOKEN,
+        )
+        return None
+
+
+def count_tokens(text: str, model: str = "text-embedding-3-small") -> int:
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def split_text_by_tokens(
+    text: str, max_tokens: int, model: str = "text-embedding-3-small"
+) -> List[str]:
+    max_tokens = max(1, max_tokens)
+    encoding = _get_encoding(model)
+    if encoding is None:
+        window = max(1, math.floor(max_tokens * CHARS_PER_TOKEN))
+        return [text[start : start + window] for start in range(0, len(text), window)]
+
+    tokens = encoding.encode(text, disallowed_special=())
+    return [
+        encoding.decode(tokens[start : start + max_tokens])
+        for start in range(0, len(tokens), max_tokens)
+    ]